@@ -17,19 +17,31 @@
 """
 # standard library imports
 from decimal import Decimal
-import json
 import logging
+import os.path
+import threading
 
 # 3rd party library imports
 import requests
 
 # our own library imports
 from monerowallet import exceptions
+from monerowallet.daemon import MoneroDaemon
+from monerowallet.quotes import FeeQuoteCache
+from monerowallet.replicas import CURSOR_METHODS, READ_METHODS, ReplicaSet
+from monerowallet.rpc import RPCClient
+from monerowallet.scheduler import BULK, RequestScheduler
+from monerowallet.snapshot import Snapshot
+from monerowallet.subaddress import SubaddressIndex
+from monerowallet.watcher import HeightWatcher
 
 _log = logging.getLogger(__name__)
 
+# number of blocks fetched again on sync, to catch up with chain reorganizations
+SNAPSHOT_REORG_DEPTH = 10
 
-class MoneroWallet(object):
+
+class MoneroWallet(RPCClient):
     '''
     The MoneroWallet class. Instantiate a MoneroWallet object with parameters
     to  dialog with the RPC wallet server.
@@ -46,6 +58,24 @@ class MoneroWallet(object):
     :type rpcuser: str
     :param rpcpassword: The password to log in to the RPC server (defaults to 'default')
     :type rpcpassword: str
+    :param snapshot_path: The file where :py:meth:`sync` persists the wallet state (defaults to None, no persistence)
+    :type snapshot_path: str
+    :param scheduler: The scheduler of the requests, which may be shared by the objects using the same RPC server
+                      (defaults to None, a new one serving one request at a time)
+    :type scheduler: monerowallet.scheduler.RequestScheduler
+    :param session: The HTTP session, which may be shared to share its connection pool (defaults to None, a new session)
+    :type session: requests.Session
+    :param replicas: Read replicas of the server, e.g. view-only wallets of the same account, as a list of dictionaries
+                     with the server parameters which differ from this server ones, e.g. [{'port': 18092}]
+                     (defaults to None, no replica); get_bulk_payments is only sent to a replica which was
+                     at least at the last height returned by :py:meth:`getheight`, so that payments above a
+                     height read from this server are not missed
+    :type replicas: list
+    :param max_replica_lag: Number of blocks a replica may lag behind this server before it stops receiving requests (defaults to 2)
+    :type max_replica_lag: int
+    :param daemon: The client of the daemon the wallet is connected to, whose cached height is used by
+                   :py:meth:`confirmations` and :py:meth:`quote_transfer` (defaults to None)
+    :type daemon: monerowallet.daemon.MoneroDaemon
 
     :return: A MoneroWallet object
     :rtype: MoneroWallet
@@ -58,8 +88,198 @@ class MoneroWallet(object):
 
     '''
 
-    def __init__(self, protocol='http', host='127.0.0.1', port=18082, path='/json_rpc', rpcuser='default', rpcpassword='default'):
-        self.server = {'protocol': protocol, 'host': host, 'port': port, 'path': path, 'rpcuser': rpcuser, 'rpcpassword': rpcpassword}
+    def __init__(self, protocol='http', host='127.0.0.1', port=18082, path='/json_rpc', rpcuser='default', rpcpassword='default',
+                 snapshot_path=None, scheduler=None, session=None, replicas=None, max_replica_lag=2,
+                 daemon=None):
+        super(MoneroWallet, self).__init__(protocol, host, port, path, rpcuser, rpcpassword, session)
+        self.replicas = None
+        if replicas:
+            self.replicas = ReplicaSet([dict(self.server, **replica) for replica in replicas], max_lag=max_replica_lag)
+        self.daemon = daemon
+        # name of the wallet file last opened with open_wallet or create_wallet
+        self.open_wallet_name = None
+        self.fee_quotes = FeeQuoteCache()
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.snapshot_path = snapshot_path
+        self.snapshot = None
+        self._subaddresses = None
+        self._subaddresses_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_lock = threading.Lock()
+
+    @property
+    def watcher(self):
+        '''
+        The height watcher shared by every user of this wallet object. It is created on
+        first access, and polls only once started.
+
+        :return: The height watcher
+        :rtype: monerowallet.watcher.HeightWatcher
+
+        :Example:
+
+        >>> mw.watcher.subscribe(lambda event: print(event.height))
+        >>> mw.watcher.start()
+        1146043
+
+        '''
+        if self._watcher is None:
+            with self._watcher_lock:
+                if self._watcher is None:
+                    self._watcher = HeightWatcher(self)
+        return self._watcher
+
+    @property
+    def subaddresses(self):
+        '''
+        The index of the wallet subaddresses, built from the RPC server on first access
+        and kept up to date by :py:meth:`create_address`, :py:meth:`create_account` and
+        :py:meth:`label_address`.
+
+        :return: The subaddress index
+        :rtype: monerowallet.subaddress.SubaddressIndex
+
+        :Example:
+
+        >>> mw.subaddresses.lookup('BgZRz9ow9UUjU2ZhhJGLejDLACY7Tf74UGQjaD8YpVguYH76A8RZGC27hLgTGDo38mBaP78vyTFQbM1oV7YSuMjH3Wj5iBj')
+        (0, 3, '')
+        >>> mw.subaddresses.address(0, 3)
+        'BgZRz9ow9UUjU2ZhhJGLejDLACY7Tf74UGQjaD8YpVguYH76A8RZGC27hLgTGDo38mBaP78vyTFQbM1oV7YSuMjH3Wj5iBj'
+
+        '''
+        if self._subaddresses is None:
+            with self._subaddresses_lock:
+                if self._subaddresses is None:
+                    index = SubaddressIndex()
+                    self.__index_accounts(index, self.get_accounts().get('subaddress_accounts', []))
+                    self._subaddresses = index
+        return self._subaddresses
+
+    def __index_accounts(self, index, accounts):
+        '''Fetch every subaddress of the given accounts from the server'''
+        for account in accounts:
+            major = account['account_index']
+            result = self.__sendrequest("getaddress", {'account_index': major})
+            if 'addresses' in result:
+                for subaddress in result['addresses']:
+                    index.add(major, subaddress['address_index'], subaddress['address'], subaddress.get('label'))
+            elif 'base_address' in account:
+                # older wallets only list subaddresses holding a balance
+                index.add(major, 0, account['base_address'], account.get('label'))
+                for subaddress in self.getbalance(major).get('per_subaddress', []):
+                    index.add(major, subaddress['address_index'], subaddress['address'], subaddress.get('label'))
+
+    def __index_subaddresses_from(self, index, major, minor):
+        '''Fetch the subaddresses of an account from a given index on, and tell whether there were any'''
+        # the server rejects the whole call if one index is past the last subaddress: probe one index,
+        # then fetch twice as many each time, back to one after a rejection
+        count = 1
+        found = False
+        while True:
+            try:
+                result = self.__sendrequest("getaddress", {'account_index': major,
+                                                           'address_index': list(range(minor, minor + count))})
+            except exceptions.AddressIndexOutOfBound:
+                if count == 1:
+                    return found
+                count = 1
+                continue
+            for subaddress in result.get('addresses', []):
+                index.add(major, subaddress['address_index'], subaddress['address'], subaddress.get('label'))
+            found = True
+            minor += count
+            count *= 2
+
+    def __sync_subaddresses(self, snapshot):
+        '''Index the accounts and subaddresses created since the snapshot, and tell whether there were any'''
+        index = snapshot.subaddresses
+        accounts = snapshot.accounts.get('subaddress_accounts', [])
+        changed = False
+        for account in accounts:
+            major = account['account_index']
+            highest = index.max_minor(major)
+            if self.__index_subaddresses_from(index, major, 0 if highest is None else highest + 1):
+                changed = True
+        major = max([account['account_index'] for account in accounts] + [-1]) + 1
+        while True:
+            try:
+                self.__index_accounts(index, [{'account_index': major}])
+            except exceptions.AccountIndexOutOfBound:
+                return changed
+            changed = True
+            major += 1
+
+    def sync(self):
+        '''
+        Bring the cached wallet state up to date, and persist it if a snapshot path was given.
+
+        On first call the state is read from the snapshot file, if it exists and matches the
+        wallet address and height; an unreadable snapshot is ignored. Only what changed since the
+        snapshot is then fetched: the payments and transfers of the blocks since the snapshot, minus
+        a few blocks in case of reorganization, the accounts and subaddresses created since, found by
+        asking for the index following the last known one, and the accounts if any of these changed.
+        Labels changed by other clients are only picked up with the subaddresses created since.
+
+        :return: The wallet state
+        :rtype: monerowallet.snapshot.Snapshot
+
+        :Example:
+
+        >>> snapshot = mw.sync()
+        >>> snapshot.height
+        1146043
+        >>> len(snapshot.payments)
+        12
+
+        '''
+        with self._sync_lock:
+            height = self.getheight()
+            snapshot = self.snapshot
+            if snapshot is None:
+                address = self.getaddress()
+                if self.snapshot_path is not None and os.path.exists(self.snapshot_path):
+                    try:
+                        snapshot = Snapshot.load(self.snapshot_path, address=address, max_height=height)
+                    except exceptions.SnapshotError as err:
+                        # the snapshot is only a cache, it is rebuilt and overwritten below
+                        _log.warning("Ignoring snapshot {0}: {1}".format(self.snapshot_path, err))
+                if snapshot is None:
+                    _log.debug("No usable snapshot, fetching the whole wallet state")
+                    snapshot = Snapshot(address, height=-1)
+            elif snapshot.height > height:
+                # the wallet was rescanned or restored: start over
+                snapshot = Snapshot(snapshot.address, height=-1)
+
+            # the server only returns the payments and transfers above min_block_height
+            min_block_height = max(0, snapshot.height - SNAPSHOT_REORG_DEPTH)
+            if snapshot.height != height:
+                if not snapshot.accounts:
+                    snapshot.accounts = self.get_accounts()
+                    self.__index_accounts(snapshot.subaddresses, snapshot.accounts.get('subaddress_accounts', []))
+                    stale = False
+                else:
+                    # other clients of the wallet may have created accounts and subaddresses
+                    stale = self.__sync_subaddresses(snapshot)
+                transfers = self.get_transfers(min_height=min_block_height, all_accounts=True)
+                for kind in ('in', 'out'):
+                    snapshot.transfers[kind] = [transfer for transfer in snapshot.transfers.get(kind, [])
+                                                if transfer['height'] <= min_block_height]
+                    snapshot.transfers[kind].extend(transfers.get(kind, []))
+                    # balances only change with transfers
+                    stale = stale or (snapshot.height >= 0 and bool(transfers.get(kind)))
+                if stale:
+                    snapshot.accounts = self.get_accounts()
+            snapshot.payments = [payment for payment in snapshot.payments
+                                 if payment['block_height'] <= min_block_height]
+            snapshot.payments.extend(self.get_bulk_payments(min_block_height=min_block_height))
+            snapshot.height = height
+
+            self.snapshot = snapshot
+            self._subaddresses = snapshot.subaddresses
+            if self.snapshot_path is not None:
+                snapshot.save(self.snapshot_path)
+            return snapshot
 
     def getbalance(self, account_index=0):
         '''
@@ -116,19 +336,28 @@ class MoneroWallet(object):
         >>> mw.create_address()
         {'address': 'BgZRz9ow9UUjU2ZhhJGLejDLACY7Tf74UGQjaD8YpVguYH76A8RZGC27hLgTGDo38mBaP78vyTFQbM1oV7YSuMjH3Wj5iBj', 'address_index': 3}
         '''
-        return self.__sendrequest("create_address", {'account_index': account_index, 'label': label})
+        result = self.__sendrequest("create_address", {'account_index': account_index, 'label': label})
+        if self._subaddresses is not None:
+            self._subaddresses.add(account_index, result['address_index'], result['address'], label)
+        return result
 
     def label_address(self, account_index=0, address_index=0, label=None):
-        return self.__sendrequest(
+        result = self.__sendrequest(
             "label_address", {
                 'index': { 'major': account_index, 'minor': address_index },
                 'label': label})
+        if self._subaddresses is not None:
+            self._subaddresses.set_label(account_index, address_index, label)
+        return result
 
     def get_accounts(self):
         return self.__sendrequest("get_accounts")
 
     def create_account(self, label=None):
-        return self.__sendrequest("create_account", { 'label': label })
+        result = self.__sendrequest("create_account", { 'label': label })
+        if self._subaddresses is not None:
+            self._subaddresses.add(result['account_index'], 0, result['address'], label)
+        return result
 
     def getheight(self):
         '''
@@ -145,10 +374,28 @@ class MoneroWallet(object):
         '''
         return self.__sendrequest("getheight")['height']
 
+    def confirmations(self, block_height):
+        '''
+        Return the number of confirmations of a transaction, computed from the last height seen by the
+        running :py:attr:`watcher`, else from the cached height of the daemon if any, else from :py:meth:`getheight`.
+
+        :param block_height: The height of the block including the transaction, e.g. from :py:meth:`get_payments`
+        :type block_height: int
+        :return: The number of confirmations
+        :rtype: int
+
+        :Example:
+
+        >>> mw.confirmations(1146033)
+        10
+
+        '''
+        return max(0, self.__current_height() - block_height)
+
     def transfer(self, destinations,
             mixin=None, payment_id=None, priority=0,
             get_tx_key=True, get_tx_hex=False, unlock_time=None,
-            account_index=0, subaddr_indices=None):
+            account_index=0, subaddr_indices=None, do_not_relay=False):
         '''
         Send monero to a number of recipients.
 
@@ -166,6 +413,8 @@ class MoneroWallet(object):
         :type get_tx_hex: bool
         :param unlock_time: Number of blocks before the monero can be spent (0 to not add a lock). (defaults to None)
         :type unlock_time: int
+        :param do_not_relay: build the transaction without relaying it to the network (defaults to False)
+        :type do_not_relay: bool
         :return: a dict with the transaction hash (tx_hash; type: str), the fee (fee; type: int), the transaction as hex string (tx_blob; type: str) if get_tx_hex was True and the key of the transaction (tx_key; type: str) if get_tx_key was True
         :rtype: dict
 
@@ -186,13 +435,14 @@ class MoneroWallet(object):
                 "unlock_time": unlock_time,
                 "get_tx_key": get_tx_key,
                 "get_tx_hex": get_tx_hex,
+                "do_not_relay": do_not_relay or None,
             })
 
     def transfer_split(self, destinations,
             mixin=None, payment_id=None, priority=0,
             get_tx_keys=True, get_tx_hex=False,
             unlock_time=None, new_algorithm=True,
-            account_index=0, subaddr_indices=None):
+            account_index=0, subaddr_indices=None, do_not_relay=False):
         '''
         Send monero to a number of recipients. Can split into more than one transaction if necessary.
 
@@ -212,6 +462,8 @@ class MoneroWallet(object):
         :type unlock_time: int
         :param new_algorithm: True to use the new transaction construction algorithm (defaults to False)
         :type new_algorithm: bool
+        :param do_not_relay: build the transactions without relaying them to the network (defaults to False)
+        :type do_not_relay: bool
 
         :return: a dict containing a list with the atomic amounts per transaction (amount_list; type:int), a list of the fees per transaction (fee_list; type: int), a list containing the transaction hashes (tx_hash_list; type: str) and a list containing the transaction keys (tx_key_list; type: str) if get_tx_key was True
         :rtype: dict of lists
@@ -234,9 +486,57 @@ class MoneroWallet(object):
                 "unlock_time": unlock_time,
                 "get_tx_keys": get_tx_keys,
                 "get_tx_hex": get_tx_hex,
-                "new_algorithm": new_algorithm
+                "new_algorithm": new_algorithm,
+                "do_not_relay": do_not_relay or None,
             })
 
+    def quote_transfer(self, destinations, mixin=None, priority=0, account_index=0, subaddr_indices=None):
+        '''
+        Return the fee of a transfer, building the transaction without relaying it.
+
+        Quotes are cached by priority, number of destinations and input profile (source account and
+        subaddresses, order of magnitude of the amount) during a few blocks, see :py:attr:`fee_quotes`.
+        The height is read from the running :py:attr:`watcher` or the daemon when there is one.
+
+        :param destinations: a list of dicts of destinations, as given to :py:meth:`transfer`
+        :type destinations: list
+        :param mixin: number of outputs from the blockchain to mix with
+        :type mixin: int
+        :param priority: the priority of the transaction, as given to :py:meth:`transfer` (defaults to 0)
+        :type priority: int
+        :param account_index: index of the account to send from (defaults to 0)
+        :type account_index: int
+        :param subaddr_indices: indexes of the subaddresses to send from (defaults to None)
+        :type subaddr_indices: list
+        :return: a dict with the fee in atomic units (fee; type: int) and the height it was quoted at (height; type: int)
+        :rtype: dict
+
+        :Example:
+
+        >>> mw.quote_transfer([{"amount":10000000,"address":"A135xq3GVMdU5qtAm4hN7zjPgz8bRaiSUQmtuDdjZ6CgXayvQruJy3WPe95qj873JhK4YdTQjoR39Leg6esznQk8PckhjRN"}])
+        {'fee': 20141160000, 'height': 1146043}
+
+        '''
+        height = self.__current_height()
+        key = self.fee_quotes.key(destinations, priority, account_index, subaddr_indices, mixin)
+        quote = self.fee_quotes.get(key, height)
+        if quote is None:
+            result = self.transfer(destinations, mixin=mixin, priority=priority, get_tx_key=False,
+                                   account_index=account_index, subaddr_indices=subaddr_indices,
+                                   do_not_relay=True)
+            quote = {'fee': result['fee'], 'height': height}
+            self.fee_quotes.put(key, quote)
+        return dict(quote)
+
+    def __current_height(self):
+        '''Return the last height seen by the running watcher, or the cached daemon height, or ask the server'''
+        watcher = self._watcher
+        if watcher is not None and watcher.running and watcher.height is not None:
+            return watcher.height
+        if self.daemon is not None:
+            return self.daemon.cached_height()
+        return self.getheight()
+
     def sweep_dust(self):
         '''
         Send all dust outputs back to the wallet's, to make them easier to spend (and mix).
@@ -299,6 +599,9 @@ class MoneroWallet(object):
         This method is the preferred method over get_payments because it has the same functionality but is more extendable.
         Either is fine for looking up transactions by a single payment ID.
 
+        When sent with the bulk priority, a long list of payment ids is split into several requests so that
+        interactive requests can be served in between.
+
         :param payment_ids: A list of incoming payments, gets every payment if empty list is provided. (Defaults to [])
         :type payment_ids: list
         :param min_block_height: The minimum block height from which to look
@@ -319,18 +622,32 @@ class MoneroWallet(object):
 #        payments_to_str = ','.join(payments_list)
 #        jsoncontent = jsoncontent.replace(b'PAYMENTIDS', payments_to_str.encode())
 #        jsoncontent = jsoncontent.replace(b'HEIGHT', str(min_block_height).encode())
+        if len(payment_ids) > self.scheduler.bulk_chunk_size and \
+                self.scheduler.priority_for("get_bulk_payments") == BULK:
+            payments = []
+            for chunk in self.scheduler.chunks(payment_ids):
+                payments.extend(self.get_bulk_payments(chunk, min_block_height))
+            return payments
         result = self.__sendrequest("get_bulk_payments", {"payment_ids": payment_ids, "min_block_height": min_block_height})
         if isinstance(result, dict) and not result:
             return []
         else:
             return result['payments']
 
-    def incoming_transfers(self, transfer_type='all'):
+    def incoming_transfers(self, transfer_type='all', account_index=None, subaddr_indices=None):
         """
         Return a list of incoming transfers to the wallet.
 
+        When sent with the bulk priority, the transfers of an account with many subaddresses are fetched a
+        chunk of subaddresses at a time so that interactive requests can be served in between; they are then
+        grouped by chunk.
+
         :param transfer_type: The transfer type ('all', 'available' or 'unavailable')
         :type transfer_type: str
+        :param account_index: Index of the account to get the transfers of (defaults to None, the server default)
+        :type account_index: int
+        :param subaddr_indices: Indexes of the subaddresses to get the transfers of (defaults to None, every subaddress)
+        :type subaddr_indices: list
         :return: A list with the incoming transfers
         :rtype: list
 
@@ -351,13 +668,75 @@ class MoneroWallet(object):
         ]
 
         """
-        result = self.__sendrequest("incoming_transfers", {"transfer_type": transfer_type})
+        if subaddr_indices is None and self.scheduler.priority_for("incoming_transfers") == BULK:
+            # one call returns the transfers of one account, the server default being the first one
+            major = 0 if account_index is None else account_index
+            index = self.subaddresses
+            highest = index.max_minor(major)
+            self.__index_subaddresses_from(index, major, 0 if highest is None else highest + 1)
+            highest = index.max_minor(major)
+            if highest is not None and highest >= self.scheduler.bulk_chunk_size:
+                transfers = []
+                for chunk in self.scheduler.chunks(list(range(highest + 1))):
+                    transfers.extend(self.incoming_transfers(transfer_type, account_index, chunk))
+                return transfers
+        result = self.__sendrequest("incoming_transfers", {"transfer_type": transfer_type,
+                                                           "account_index": account_index,
+                                                           "subaddr_indices": subaddr_indices})
         try:
             return result['transfers']
         except KeyError:
             # XXX: It would be nice of wallet RPC to return empty list here
             return []
 
+    def get_transfers(self, incoming=True, outgoing=True, pending=False, failed=False, pool=False,
+                      min_height=None, max_height=None, account_index=None, subaddr_indices=None, all_accounts=None):
+        '''
+        Return the transfer history of the wallet, by type.
+
+        :param incoming: Include incoming transfers (defaults to True)
+        :type incoming: bool
+        :param outgoing: Include outgoing transfers (defaults to True)
+        :type outgoing: bool
+        :param pending: Include pending transfers (defaults to False)
+        :type pending: bool
+        :param failed: Include failed transfers (defaults to False)
+        :type failed: bool
+        :param pool: Include incoming transfers from the transaction pool (defaults to False)
+        :type pool: bool
+        :param min_height: Only return the transfers of the blocks above this height (defaults to None, no minimum)
+        :type min_height: int
+        :param max_height: Only return the transfers of the blocks up to this height (defaults to None, no maximum)
+        :type max_height: int
+        :param account_index: Index of the account to get the transfers of (defaults to None, the server default)
+        :type account_index: int
+        :param subaddr_indices: Indexes of the subaddresses to get the transfers of (defaults to None, every subaddress)
+        :type subaddr_indices: list
+        :param all_accounts: Return the transfers of every account (defaults to None, the server default)
+        :type all_accounts: bool
+        :return: A dictionary with a list of transfers by type ('in', 'out', 'pending', 'failed', 'pool'),
+                 the types without transfers being left out
+        :rtype: dict
+
+        :Example:
+
+        >>> mw.get_transfers(outgoing=False, min_height=1146040)
+        {'in': [{'address': '94EJSG4URLDVwzAgDvCLaRwFGHxv75DT5MvFp1YfAxQU9icGxjVJiY8Jr9YF1atXN7UFBDx3vJq2s3CzULkPrEAuEioqyrP', 'amount': 1000000000, 'fee': 30000000, 'height': 1146043, 'note': '', 'payment_id': 'fdfcfd993482b58b', 'subaddr_index': {'major': 0, 'minor': 0}, 'timestamp': 1502711396, 'txid': 'db3870905ce3c8ca349e224688c344371addca7be4eb36d5dbc61600c8f75726', 'type': 'in', 'unlock_time': 0}]}
+
+        '''
+        filter_by_height = min_height is not None or max_height is not None
+        return self.__sendrequest("get_transfers", {"in": incoming,
+                                                    "out": outgoing,
+                                                    "pending": pending,
+                                                    "failed": failed,
+                                                    "pool": pool,
+                                                    "filter_by_height": filter_by_height or None,
+                                                    "min_height": min_height,
+                                                    "max_height": max_height,
+                                                    "account_index": account_index,
+                                                    "subaddr_indices": subaddr_indices,
+                                                    "all_accounts": all_accounts})
+
     def query_key(self, key_type='mnemonic'):
         '''
         Return the spend or view private key.
@@ -425,7 +804,9 @@ class MoneroWallet(object):
         {}
 
         '''
-        return self.__sendrequest("stop_wallet")
+        result = self.__sendrequest("stop_wallet")
+        self.open_wallet_name = None
+        return result
 
     def make_uri(self, address, amount, payment_id, recipient_name, tx_description):
         '''
@@ -439,66 +820,74 @@ class MoneroWallet(object):
         '''
         Create a new wallet. The daemon should be running with --wallet-dir arg.
         '''
-        return self.__sendrequest(
+        result = self.__sendrequest(
             "create_wallet", {
                 'filename': filename,
                 'password': password,
                 'language': language })
+        # the server opens the wallet it creates
+        self.open_wallet_name = filename
+        return result
 
     def open_wallet(self, filename, password):
         '''
         Open existing wallet. The daemon should be running with --wallet-dir arg.
         '''
-        return self.__sendrequest(
+        result = self.__sendrequest(
             "open_wallet", {
                 'filename': filename,
                 'password': password })
+        self.open_wallet_name = filename
+        return result
+
+    def raw_request(self, method, params={}):
+        '''
+        Send any RPC method, e.g. one without a dedicated method yet, with the same routing, scheduling
+        and error handling as the other methods.
+
+        :param method: The RPC method
+        :type method: str
+        :param params: The parameters of the method, the ones set to None being left out
+        :type params: dict
+        :return: The result of the method
+        :rtype: dict
+
+        :Example:
+
+        >>> mw.raw_request('get_languages')
+        {'languages': ['Deutsch', 'English', 'Español', 'Français', 'Italiano', 'Nederlands', 'Português', 'русский язык', '日本語', '简体中文 (中国)', 'Esperanto', 'Lojban']}
+
+        '''
+        return self.__sendrequest(method, params)
 
     def __sendrequest(self, method, params={}):
-        '''Send a request to the server'''
-        self.headers = {'Content-Type': 'application/json'}
-        data = {'jsonrpc': '2.0', 'id': '0', 'method': method}
-        validparams = {}
-        for key in params:
-            if params[key] is not None:
-                validparams[key] = params[key]
-        if validparams:
-            data['params'] = validparams
-        _log.debug("Method: {0}, params: {1}".format(method, validparams))
-        req = requests.post('{protocol}://{host}:{port}{path}'.format(protocol=self.server['protocol'],
-                                                                      host=self.server['host'],
-                                                                      port=self.server['port'],
-                                                                      path=self.server['path']),
-                            headers=self.headers,
-                            data=json.dumps(data),
-                            auth=requests.auth.HTTPDigestAuth(self.server['rpcuser'], self.server['rpcpassword'])
-                            )
-
-        if req.status_code == 401:
-            raise exceptions.Unauthorized('401 Unauthorized. Check username and password.')
-        elif req.status_code != 200:
-            raise exceptions.StatusCodeError('Unexpected returned status code: {}'.format(req.status_code))
-        result = req.json()
-        _log.debug("Result: {0}".format(result))
-
-        # if server-side error is detected, print it
-        if 'error' in result:
-            code = result['error']['code']
-            message = result['error']['message']
-            if code == -32601:
-                raise exceptions.MethodNotFoundError(
-                    'Unexpected method while requesting the server: {}'.format(
-                        json.dumps(data)))
-            elif code == -32602:
-                raise exceptions.InvalidParamsError(
-                    'Invalid parameters while requesting the server: {}'.format(
-                        json.dumps(data)))
-            elif code in exceptions._errorcode_to_exception.keys():
-                raise exceptions._errorcode_to_exception[code](message)
-            else:
-                raise exceptions.Error('Error {code}: {message}'.format(**result['error']))
-            # otherwise return result
-        return result['result']
+        '''Send a request to the server, or to a replica for read-only methods'''
+        data = self._request(method, params)
+        if self.replicas is not None and method in READ_METHODS:
+            self.replicas.check(self.__replica_height)
+            replica = self.replicas.acquire(self.replicas.primary_height if method in CURSOR_METHODS else None)
+            if replica is not None:
+                try:
+                    result = self._post(data, replica.server)
+                except requests.exceptions.RequestException as err:
+                    self.replicas.release(replica, failed=True)
+                    _log.warning("Replica {0!r} failed, falling back to the primary: {1}".format(replica, err))
+                else:
+                    self.replicas.release(replica)
+                    return result
+        with self.scheduler.slot(self.scheduler.priority_for(method)):
+            result = self._post(data)
+        if self.replicas is not None and method == 'getheight':
+            self.replicas.observe(result['height'])
+        return result
+
+    def __replica_height(self, server=None):
+        '''Return the height of the primary, or of the replica with the given server parameters'''
+        data = self._request('getheight')
+        if server is None:
+            with self.scheduler.slot(self.scheduler.priority_for('getheight')):
+                return self._post(data)['height']
+        return self._post(data, server)['height']
 
 
 def atomic_to_coins(units):
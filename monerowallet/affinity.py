@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``affinity`` module
+    =============================
+
+    Share one monero-wallet-rpc server running with ``--wallet-dir`` between
+    many wallet files.
+
+    Opening a wallet loads and refreshes it, which takes seconds. Instead of
+    sending requests in the order they come, the scheduler groups them by wallet
+    file and runs each group while its wallet is open, only switching wallets
+    when the switch policy says so.
+
+    :Example:
+
+    >>> from monerowallet.affinity import WalletAffinityScheduler
+    >>> mw = MoneroWallet()
+    >>> affinity = WalletAffinityScheduler(mw)
+    >>> affinity.register('shop1', 'sh0p1 p4ssw0rd')
+    >>> affinity.register('shop2', 'sh0p2 p4ssw0rd')
+    >>> affinity.start()
+    >>> affinity.call('shop1', 'getbalance')
+    {'unlocked_balance': 2262265030000, 'balance': 2262265030000}
+    >>> future = affinity.submit('shop2', 'getaddress')
+    >>> future.result()
+    '94EJSG4URLDVwzAgDvCLaRwFGHxv75DT5MvFp1YfAxQU9icGxjVJiY8Jr9YF1atXN7UFBDx3vJq2s3CzULkPrEAuEioqyrP'
+
+"""
+# standard library imports
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+
+_log = logging.getLogger(__name__)
+
+# methods changing the open wallet, which would run the rest of a batch against another wallet file,
+# by MoneroWallet or RPC method name
+WALLET_SWITCHING_METHODS = frozenset([
+    'open_wallet',
+    'close_wallet',
+    'create_wallet',
+    'restore_deterministic_wallet',
+    'generate_from_keys',
+    'stop_wallet',
+])
+
+
+class _Call(object):
+    __slots__ = ('method', 'args', 'kwargs', 'deadline', 'future')
+
+    def __init__(self, method, args, kwargs, deadline):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.deadline = deadline
+        self.future = concurrent.futures.Future()
+
+
+def longest_queue(queues, current):
+    '''
+    Switch policy serving the wallet with the most queued calls, the open wallet winning ties.
+    Wallets with calls past their deadline are served first, by :py:func:`oldest_deadline`, so
+    that a wallet with few calls is not left waiting behind busier ones.
+
+    :param queues: The queued calls, by wallet file name
+    :type queues: dict
+    :param current: The name of the open wallet file, or None
+    :type current: str
+    :return: The name of the wallet file to serve
+    :rtype: str
+
+    '''
+    now = time.monotonic()
+    overdue = {filename: queue for filename, queue in queues.items() if any(call.deadline < now for call in queue)}
+    if overdue:
+        return oldest_deadline(overdue, current)
+    return max(queues, key=lambda filename: (len(queues[filename]), filename == current))
+
+
+def oldest_deadline(queues, current):
+    '''
+    Switch policy serving the wallet with the earliest deadline, the open wallet winning ties.
+
+    :param queues: The queued calls, by wallet file name
+    :type queues: dict
+    :param current: The name of the open wallet file, or None
+    :type current: str
+    :return: The name of the wallet file to serve
+    :rtype: str
+
+    '''
+    return min(queues, key=lambda filename: (min(call.deadline for call in queues[filename]), filename != current))
+
+
+class WalletAffinityScheduler(object):
+    '''
+    Queue calls by wallet file and run them in groups on a shared wallet RPC server.
+
+    :param wallet: The client of the shared wallet RPC server
+    :type wallet: monerowallet.MoneroWallet
+    :param policy: The switch policy, a callable such as :py:func:`longest_queue` or :py:func:`oldest_deadline`
+                   (defaults to longest_queue)
+    :type policy: callable
+    :param max_batch: Number of calls run on a wallet before the policy is asked again (defaults to 100)
+    :type max_batch: int
+    :param default_deadline: Deadline of the calls submitted without one, in seconds (defaults to 60)
+    :type default_deadline: float
+    :raises ValueError: if the wallet has read replicas, which would answer for whatever wallet file they have open
+
+    '''
+
+    def __init__(self, wallet, policy=longest_queue, max_batch=100, default_deadline=60):
+        if getattr(wallet, 'replicas', None) is not None:
+            raise ValueError('A wallet with read replicas cannot be shared between wallet files')
+        self.wallet = wallet
+        self.policy = policy
+        self.max_batch = max_batch
+        self.default_deadline = default_deadline
+        self.switches = 0
+        self.skipped_opens = 0
+        self._passwords = {}
+        self._queues = collections.OrderedDict()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def register(self, filename, password):
+        '''
+        Declare a wallet file served by the scheduler.
+
+        :param filename: The wallet file name, relative to the --wallet-dir of the server
+        :type filename: str
+        :param password: The wallet password
+        :type password: str
+
+        '''
+        with self._condition:
+            self._passwords[filename] = password
+
+    def submit(self, filename, method, *args, deadline=None, **kwargs):
+        '''
+        Queue a call to a method of a wallet file.
+
+        :param filename: The wallet file name, registered with :py:meth:`register`
+        :type filename: str
+        :param method: The name of the :py:class:`monerowallet.MoneroWallet` method
+        :type method: str
+        :param deadline: Time in seconds within which the call should run, used by the oldest_deadline
+                         policy and to serve overdue calls first with the longest_queue policy
+                         (defaults to None, the default deadline of the scheduler)
+        :type deadline: float
+        :return: A future holding the result of the call
+        :rtype: concurrent.futures.Future
+        :raises ValueError: if the method, or the RPC method sent by raw_request, changes the open wallet,
+                            see WALLET_SWITCHING_METHODS
+
+        '''
+        rpc_method = args[0] if method == 'raw_request' and args else method
+        if method in WALLET_SWITCHING_METHODS or rpc_method in WALLET_SWITCHING_METHODS:
+            raise ValueError('{} changes the open wallet and cannot be scheduled'.format(rpc_method))
+        if filename not in self._passwords:
+            raise KeyError('Unregistered wallet file: {}'.format(filename))
+        if deadline is None:
+            deadline = self.default_deadline
+        call = _Call(method, args, kwargs, time.monotonic() + deadline)
+        with self._condition:
+            self._queues.setdefault(filename, collections.deque()).append(call)
+            self._condition.notify()
+        return call.future
+
+    def call(self, filename, method, *args, **kwargs):
+        '''
+        Queue a call and wait for its result. The scheduler must be started.
+
+        :return: The result of the method
+
+        '''
+        return self.submit(filename, method, *args, **kwargs).result()
+
+    def depth(self):
+        '''
+        Return the number of queued calls by wallet file name.
+
+        :rtype: dict
+
+        '''
+        with self._condition:
+            return {filename: len(queue) for filename, queue in self._queues.items()}
+
+    def start(self):
+        '''
+        Start the worker thread, if not already running.
+        '''
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='monerowallet-affinity', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        '''
+        Stop the worker thread once the current batch is done. Queued calls stay queued.
+        '''
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_pending(self):
+        '''
+        Run one batch of queued calls in the current thread.
+
+        :return: The number of calls run
+        :rtype: int
+
+        '''
+        with self._condition:
+            if not self._queues:
+                return 0
+            filename = self.policy(self._queues, self.wallet.open_wallet_name)
+            queue = self._queues[filename]
+            batch = [queue.popleft() for _ in range(min(self.max_batch, len(queue)))]
+            if not queue:
+                del self._queues[filename]
+            password = self._passwords[filename]
+        batch = [call for call in batch if call.future.set_running_or_notify_cancel()]
+        if not batch:
+            return 0
+        if self.wallet.open_wallet_name == filename:
+            self.skipped_opens += 1
+        else:
+            _log.debug("Switching from wallet {0} to {1}".format(self.wallet.open_wallet_name, filename))
+            try:
+                self.wallet.open_wallet(filename, password)
+            except Exception as err:
+                for call in batch:
+                    call.future.set_exception(err)
+                return len(batch)
+            self.switches += 1
+        for call in batch:
+            try:
+                result = getattr(self.wallet, call.method)(*call.args, **call.kwargs)
+            except Exception as err:
+                call.future.set_exception(err)
+            else:
+                call.future.set_result(result)
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queues and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+            self.run_pending()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``base58`` module
+    =============================
+
+    Monero flavour of base58, used to convert addresses between their
+    textual and binary forms.
+
+    Monero does not encode the whole address as one big number like Bitcoin
+    does: it splits the data in blocks of 8 bytes, each encoded into exactly
+    11 characters, the last block being shorter.
+
+    :Example:
+
+    >>> from monerowallet import base58
+    >>> raw = base58.decode('44AFFq5kSiGBoZ4NMDwYtN18obc8AemS33DBLWs3H7otXft3XjrpDtQGv7SqSsaBYBb98uNbr2VBBEt7f2wfn3RVGQBEP3A')
+    >>> len(raw)
+    69
+
+"""
+
+ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+_FULL_BLOCK_SIZE = 8
+_FULL_ENCODED_BLOCK_SIZE = 11
+# size of an encoded block, indexed by the size of the decoded block
+_ENCODED_BLOCK_SIZES = [0, 2, 3, 5, 6, 7, 9, 10, 11]
+_DECODED_BLOCK_SIZES = {size: index for index, size in enumerate(_ENCODED_BLOCK_SIZES)}
+_INDEXES = {char: index for index, char in enumerate(ALPHABET)}
+
+
+def encode(data):
+    '''
+    Encode bytes into a Monero base58 string.
+
+    :param data: The binary data to encode
+    :type data: bytes
+    :return: The base58 string
+    :rtype: str
+
+    '''
+    chunks = []
+    for start in range(0, len(data), _FULL_BLOCK_SIZE):
+        block = data[start:start + _FULL_BLOCK_SIZE]
+        number = int.from_bytes(block, 'big')
+        chars = []
+        for _ in range(_ENCODED_BLOCK_SIZES[len(block)]):
+            number, remainder = divmod(number, 58)
+            chars.append(ALPHABET[remainder])
+        chunks.append(''.join(reversed(chars)))
+    return ''.join(chunks)
+
+
+def decode(text):
+    '''
+    Decode a Monero base58 string into bytes.
+
+    :param text: The base58 string to decode
+    :type text: str
+    :return: The decoded binary data
+    :rtype: bytes
+    :raises ValueError: if the string is not valid Monero base58
+
+    '''
+    chunks = []
+    for start in range(0, len(text), _FULL_ENCODED_BLOCK_SIZE):
+        block = text[start:start + _FULL_ENCODED_BLOCK_SIZE]
+        size = _DECODED_BLOCK_SIZES.get(len(block))
+        if size is None:
+            raise ValueError('Invalid base58 block length: {}'.format(len(block)))
+        number = 0
+        for char in block:
+            try:
+                number = number * 58 + _INDEXES[char]
+            except KeyError:
+                raise ValueError('Invalid base58 character: {!r}'.format(char))
+        try:
+            chunks.append(number.to_bytes(size, 'big'))
+        except OverflowError:
+            raise ValueError('Invalid base58 block: {}'.format(block))
+    return b''.join(chunks)
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``confirmations`` module
+    =============================
+
+    Track the confirmations of many pending transactions at once.
+
+    Transactions are kept in a heap ordered by the height at which they mature,
+    so each height change only looks at the transactions which just matured.
+
+    :Example:
+
+    >>> tracker = ConfirmationTracker(on_confirmed=lambda entry: print(entry.tx_hash))
+    >>> for payment in mw.get_bulk_payments(min_block_height=1146000):
+    ...     tracker.add(payment['tx_hash'], payment['block_height'], 10, payment['unlock_time'])
+    >>> tracker.attach(mw.watcher)
+    >>> mw.watcher.start()
+    db3870905ce3c8ca349e224688c344371addca7be4eb36d5dbc61600c8f75726
+
+"""
+# standard library imports
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+# our own library imports
+from monerowallet.watcher import BLOCK_TIME
+
+# unlock times below this value are block heights, above are timestamps
+UNLOCK_TIME_IS_TIMESTAMP = 500000000
+
+
+class PendingTransaction(object):
+    '''
+    A transaction tracked by :py:class:`ConfirmationTracker`.
+
+    :ivar tx_hash: The transaction hash
+    :ivar block_height: The height of the block including the transaction
+    :ivar required_confirmations: The number of confirmations to wait for
+    :ivar unlock_time: The unlock time of the transaction (block height, or timestamp if above 500000000)
+    :ivar mature_height: The wallet height at which the transaction is considered confirmed
+
+    '''
+
+    __slots__ = ('tx_hash', 'block_height', 'required_confirmations', 'unlock_time', 'mature_height')
+
+    def __init__(self, tx_hash, block_height, required_confirmations, unlock_time=0):
+        self.tx_hash = tx_hash
+        self.block_height = block_height
+        self.required_confirmations = required_confirmations
+        self.unlock_time = unlock_time
+        self.mature_height = block_height + required_confirmations
+        if 0 < unlock_time < UNLOCK_TIME_IS_TIMESTAMP:
+            self.mature_height = max(self.mature_height, unlock_time)
+
+    def is_unlocked(self, now=None):
+        '''
+        Tell whether a timestamp unlock time has passed. Always True for height unlock times.
+        '''
+        if self.unlock_time < UNLOCK_TIME_IS_TIMESTAMP:
+            return True
+        return (time.time() if now is None else now) >= self.unlock_time
+
+    def __repr__(self):
+        return '<PendingTransaction {} at {} matures at {}>'.format(self.tx_hash, self.block_height, self.mature_height)
+
+
+class ConfirmationTracker(object):
+    '''
+    Fire callbacks when tracked transactions reach their required number of confirmations.
+
+    Confirmed transactions are remembered during ``reorg_depth`` blocks: if the height goes
+    back, or if :py:meth:`recheck` finds a transaction in another block, they are tracked again.
+    Transactions :py:meth:`recheck` does not find anymore are dropped.
+
+    :param on_confirmed: Called with a :py:class:`PendingTransaction` when it matures (defaults to None)
+    :type on_confirmed: callable
+    :param on_reorg: Called with a :py:class:`PendingTransaction` when a confirmed transaction is tracked again,
+                     or a transaction is dropped by :py:meth:`recheck` (defaults to None)
+    :type on_reorg: callable
+    :param reorg_depth: Number of blocks during which confirmed transactions are re-checked (defaults to 10)
+    :type reorg_depth: int
+
+    '''
+
+    def __init__(self, on_confirmed=None, on_reorg=None, reorg_depth=10):
+        self.on_confirmed = on_confirmed
+        self.on_reorg = on_reorg
+        self.reorg_depth = reorg_depth
+        self.height = None
+        # heap of (mature height, sequence, entry), entries replaced in _pending are skipped when popped
+        self._heap = []
+        self._pending = {}
+        self._confirmed = {}
+        # confirmed entries in the order they matured, to expire them from the left
+        self._recent = collections.deque()
+        self._counter = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, tx_hash):
+        return tx_hash in self._pending
+
+    def add(self, tx_hash, block_height, required_confirmations, unlock_time=0):
+        '''
+        Start tracking a transaction. A transaction already tracked is replaced.
+
+        :param tx_hash: The transaction hash
+        :type tx_hash: str
+        :param block_height: The height of the block including the transaction
+        :type block_height: int
+        :param required_confirmations: The number of confirmations to wait for
+        :type required_confirmations: int
+        :param unlock_time: The unlock time of the transaction (defaults to 0)
+        :type unlock_time: int
+        :return: The tracked transaction
+        :rtype: PendingTransaction
+
+        '''
+        entry = PendingTransaction(tx_hash, block_height, required_confirmations, unlock_time)
+        with self._lock:
+            self._confirmed.pop(tx_hash, None)
+            self._push(entry)
+        return entry
+
+    def discard(self, tx_hash):
+        '''
+        Stop tracking a transaction.
+        '''
+        with self._lock:
+            self._pending.pop(tx_hash, None)
+            self._confirmed.pop(tx_hash, None)
+
+    def update(self, height):
+        '''
+        Process a new wallet height: fire ``on_confirmed`` for the transactions which matured,
+        and ``on_reorg`` for the confirmed ones which are not confirmed anymore at this height.
+
+        :param height: The wallet height, as returned by :py:meth:`monerowallet.MoneroWallet.getheight`
+        :type height: int
+        :return: The transactions which matured
+        :rtype: list
+
+        '''
+        matured = []
+        reorged = []
+        now = time.time()
+        with self._lock:
+            if self.height is not None and height < self.height:
+                for tx_hash, entry in list(self._confirmed.items()):
+                    if entry.mature_height > height:
+                        del self._confirmed[tx_hash]
+                        self._push(entry)
+                        reorged.append(entry)
+            self.height = height
+            postponed = []
+            while self._heap and self._heap[0][0] <= height:
+                _, _, entry = heapq.heappop(self._heap)
+                if self._pending.get(entry.tx_hash) is not entry:
+                    continue
+                if not entry.is_unlocked(now):
+                    postponed.append(entry)
+                    continue
+                del self._pending[entry.tx_hash]
+                self._confirmed[entry.tx_hash] = entry
+                self._recent.append(entry)
+                matured.append(entry)
+            for entry in postponed:
+                # timestamp locked: look again around the time it unlocks
+                blocks = int((entry.unlock_time - now) // BLOCK_TIME) + 1
+                heapq.heappush(self._heap, (height + max(1, blocks), next(self._counter), entry))
+            self._forget(height)
+        self._notify(self.on_reorg, reorged)
+        self._notify(self.on_confirmed, matured)
+        return matured
+
+    def recheck(self, payments, min_block_height=None):
+        '''
+        Compare tracked transactions with fresh payments of the last blocks, e.g. the result of
+        ``mw.get_bulk_payments(payment_ids, min_block_height=tracker.height - tracker.reorg_depth)``.
+        Transactions found in another block are tracked again from their new block height.
+        Transactions of the rechecked blocks, above min_block_height, which are missing from the
+        payments were reorganized out of the chain: they are not tracked anymore, and ``on_reorg`` is
+        called with them. The payments must therefore cover every tracked transaction of these blocks.
+
+        :param payments: Dictionaries with at least the tx_hash and block_height keys
+        :type payments: list
+        :param min_block_height: The height the payments were fetched above (defaults to None, the tracker height minus reorg_depth)
+        :type min_block_height: int
+        :return: The transactions whose block height changed
+        :rtype: list
+
+        '''
+        moved = []
+        reorged = []
+        with self._lock:
+            if min_block_height is None and self.height is not None:
+                min_block_height = self.height - self.reorg_depth
+            found = set()
+            for payment in payments:
+                tx_hash = payment['tx_hash']
+                found.add(tx_hash)
+                entry = self._pending.get(tx_hash) or self._confirmed.get(tx_hash)
+                if entry is None or entry.block_height == payment['block_height']:
+                    continue
+                entry = PendingTransaction(tx_hash, payment['block_height'],
+                                           entry.required_confirmations, entry.unlock_time)
+                if self._confirmed.pop(tx_hash, None) is not None:
+                    reorged.append(entry)
+                self._push(entry)
+                moved.append(entry)
+            if min_block_height is not None:
+                for entries in (self._pending, self._confirmed):
+                    for tx_hash, entry in list(entries.items()):
+                        if tx_hash not in found and entry.block_height > min_block_height:
+                            # left in the heap, skipped when popped
+                            del entries[tx_hash]
+                            reorged.append(entry)
+        self._notify(self.on_reorg, reorged)
+        if self.height is not None:
+            self.update(self.height)
+        return moved
+
+    def attach(self, watcher):
+        '''
+        Update the tracker on each event of a height watcher.
+
+        :param watcher: The height watcher
+        :type watcher: monerowallet.watcher.HeightWatcher
+
+        '''
+        watcher.subscribe(lambda event: self.update(event.height))
+
+    def _push(self, entry):
+        self._pending[entry.tx_hash] = entry
+        heapq.heappush(self._heap, (entry.mature_height, next(self._counter), entry))
+
+    def _forget(self, height):
+        '''Drop confirmed transactions out of the reorganization window'''
+        limit = height - self.reorg_depth
+        while self._recent and self._recent[0].mature_height < limit:
+            entry = self._recent.popleft()
+            if self._confirmed.get(entry.tx_hash) is entry:
+                del self._confirmed[entry.tx_hash]
+
+    @staticmethod
+    def _notify(callback, entries):
+        if callback is None:
+            return
+        for entry in entries:
+            callback(entry)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``daemon`` module
+    =============================
+
+    Client of the RPC server of the Monero daemon (monerod), sharing its
+    transport with :py:class:`monerowallet.MoneroWallet`.
+
+    Chain-level questions such as the current height or the content of the
+    transaction pool are answered by the daemon, without queueing behind the
+    work of the wallet RPC server.
+
+    :Example:
+
+    >>> from monerowallet import MoneroDaemon
+    >>> md = MoneroDaemon()
+    >>> md.get_height()
+    1146043
+    >>> mw = MoneroWallet(daemon=md)
+    >>> mw.confirmations(1146033)  # cached daemon height, no wallet request
+    10
+
+"""
+# standard library imports
+import threading
+import time
+
+# our own library imports
+from monerowallet.rpc import RPCClient
+
+
+class MoneroDaemon(RPCClient):
+    '''
+    The MoneroDaemon class. Instantiate a MoneroDaemon object with parameters
+    to dialog with the RPC server of the daemon.
+
+    :param protocol: Protocol for requesting the RPC server ('http' or 'https, defaults to 'http')
+    :type protocol: str
+    :param host: The host for requesting the RPC server (defaults to '127.0.0.1')
+    :type host: str
+    :param port: The port for requesting the RPC server (defaults to 18081)
+    :type port: int
+    :param path: The path of the JSON-RPC endpoint (defaults to '/json_rpc')
+    :type path: str
+    :param rpcuser: The username to log in to the RPC server (defaults to 'default')
+    :type rpcuser: str
+    :param rpcpassword: The password to log in to the RPC server (defaults to 'default')
+    :type rpcpassword: str
+    :param session: The HTTP session, which may be shared with wallets to share its connection pool (defaults to None, a new session)
+    :type session: requests.Session
+    :param height_ttl: Time during which :py:meth:`cached_height` returns the last fetched height, in seconds (defaults to 5)
+    :type height_ttl: float
+
+    :return: A MoneroDaemon object
+    :rtype: MoneroDaemon
+
+    '''
+
+    def __init__(self, protocol='http', host='127.0.0.1', port=18081, path='/json_rpc', rpcuser='default', rpcpassword='default',
+                 session=None, height_ttl=5):
+        super(MoneroDaemon, self).__init__(protocol, host, port, path, rpcuser, rpcpassword, session)
+        self.height_ttl = height_ttl
+        self._height = None
+        self._height_at = None
+        self._height_lock = threading.Lock()
+
+    def get_height(self):
+        '''
+        Return the current height of the blockchain, through the /get_height endpoint.
+
+        :return: The number of blocks of the blockchain
+        :rtype: int
+
+        :Example:
+
+        >>> md.get_height()
+        1146043
+
+        '''
+        height = self._post_endpoint('/get_height')['height']
+        with self._height_lock:
+            self._height = height
+            self._height_at = time.monotonic()
+        return height
+
+    def cached_height(self):
+        '''
+        Return the height fetched less than height_ttl seconds ago, or fetch it.
+
+        :return: The number of blocks of the blockchain
+        :rtype: int
+
+        '''
+        with self._height_lock:
+            if self._height_at is not None and time.monotonic() - self._height_at < self.height_ttl:
+                return self._height
+        return self.get_height()
+
+    def get_block_count(self):
+        '''
+        Return the number of blocks of the blockchain, through JSON-RPC.
+
+        :return: The number of blocks
+        :rtype: int
+
+        '''
+        return self._post(self._request("get_block_count"))['count']
+
+    def get_info(self):
+        '''
+        Return general information about the daemon and the network.
+
+        :return: A dictionary with, among others, the height, the target height and the transaction pool size (tx_pool_size)
+        :rtype: dict
+
+        '''
+        return self._post(self._request("get_info"))
+
+    def get_fee_estimate(self, grace_blocks=None):
+        '''
+        Return the estimated fee per kB.
+
+        :param grace_blocks: Number of blocks the estimate should stay valid for (defaults to None)
+        :type grace_blocks: int
+        :return: The fee per kB in atomic units
+        :rtype: int
+
+        '''
+        return self._post(self._request("get_fee_estimate", {'grace_blocks': grace_blocks}))['fee']
+
+    def get_transaction_pool(self):
+        '''
+        Return the transactions and spent key images of the transaction pool.
+
+        :return: A dictionary with the transactions (transactions) and key images (spent_key_images)
+        :rtype: dict
+
+        '''
+        return self._post_endpoint('/get_transaction_pool')
+
+    def get_transaction_pool_hashes(self):
+        '''
+        Return the hashes of the transactions of the transaction pool.
+
+        :return: A list of transaction hashes
+        :rtype: list
+
+        '''
+        return self._post_endpoint('/get_transaction_pool_hashes').get('tx_hashes', [])
+
+    def get_transactions(self, tx_hashes):
+        '''
+        Look transactions up in the blockchain and the transaction pool.
+
+        :param tx_hashes: The transaction hashes
+        :type tx_hashes: list
+        :return: A list of dictionaries with, among others, the transaction hash (tx_hash), whether it is in the pool (in_pool) and its block height (block_height)
+        :rtype: list
+
+        '''
+        return self._post_endpoint('/get_transactions', {'txs_hashes': tx_hashes, 'decode_as_json': False}).get('txs', [])
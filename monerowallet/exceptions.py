@@ -21,6 +21,11 @@ class Unauthorized(HTTPStatusCodeError):
     pass
 
 
+class SnapshotError(Error):
+    "The snapshot file cannot be read"
+    pass
+
+
 class RPCError(Error):
     "RPC error returned by the wallet"
     pass
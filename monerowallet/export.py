@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``export`` module
+    =============================
+
+    Stream the history of a wallet to CSV or Parquet files.
+
+    Records are written page by page as they are fetched: incoming transfers
+    one account at a time, several accounts being fetched in parallel, and
+    payments by batches of payment ids. Requests are sent with the bulk
+    priority, so that interactive requests of other threads go first.
+
+    Payments exports can be resumed: the wallet height at the time of the
+    export is saved in a state file, and the next export only fetches the
+    payments of the blocks since that height.
+
+    The export is also available from the command line::
+
+        $ pymonerowallet-export --port 18082 --kind payments --state payments.state payments.csv
+        $ pymonerowallet-export --kind payments --payment-id 4279257e0a20608e --payment-id fdfcfd993482b58b payments.csv
+
+    :Example:
+
+    >>> from monerowallet.export import export
+    >>> export(mw, 'transfers', 'transfers.csv')
+    18322
+    >>> export(mw, 'payments', 'payments.csv', state_path='payments.state')
+    4410
+
+"""
+# standard library imports
+import argparse
+import concurrent.futures
+import csv
+from decimal import Decimal
+import json
+import os
+import sys
+
+# our own library imports
+from monerowallet import MoneroWallet, atomic_to_coins
+from monerowallet.scheduler import BULK
+
+TRANSFER_FIELDS = ['account_index', 'subaddr_index', 'tx_hash', 'global_index', 'amount', 'amount_xmr', 'spent', 'tx_size']
+PAYMENT_FIELDS = ['payment_id', 'tx_hash', 'block_height', 'unlock_time', 'address', 'amount', 'amount_xmr']
+
+
+def iter_transfers(wallet, accounts=None, transfer_type='all', max_workers=4):
+    '''
+    Iterate over the incoming transfers of several accounts, fetching up to max_workers accounts in parallel.
+    Only max_workers pages are held in memory at once.
+
+    :param wallet: The wallet
+    :type wallet: monerowallet.MoneroWallet
+    :param accounts: The account indexes (defaults to None, every account)
+    :type accounts: list
+    :param transfer_type: The transfer type ('all', 'available' or 'unavailable', defaults to 'all')
+    :type transfer_type: str
+    :param max_workers: Number of accounts fetched at the same time (defaults to 4)
+    :type max_workers: int
+    :return: An iterator of records, the incoming transfers with their account index and amount in coins (amount_xmr)
+    :rtype: iterator
+
+    '''
+    if accounts is None:
+        accounts = [account['account_index'] for account in wallet.get_accounts().get('subaddress_accounts', [])]
+
+    def fetch(account_index):
+        with wallet.scheduler.priority(BULK):
+            return account_index, wallet.incoming_transfers(transfer_type, account_index=account_index)
+
+    pending = list(reversed(accounts))
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        running = set()
+        while pending or running:
+            while pending and len(running) < max_workers:
+                running.add(executor.submit(fetch, pending.pop()))
+            done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                account_index, transfers = future.result()
+                for transfer in transfers:
+                    record = dict(transfer, account_index=account_index, amount_xmr=atomic_to_coins(transfer['amount']))
+                    if isinstance(record.get('subaddr_index'), dict):
+                        record['subaddr_index'] = record['subaddr_index']['minor']
+                    yield record
+
+
+def iter_payments(wallet, payment_ids=None, min_block_height=0):
+    '''
+    Iterate over the payments received since a height, by batches of payment ids if payment_ids is given.
+
+    :param wallet: The wallet
+    :type wallet: monerowallet.MoneroWallet
+    :param payment_ids: The payment ids (defaults to None, every payment)
+    :type payment_ids: list
+    :param min_block_height: Only the payments of the blocks above this height are returned (defaults to 0)
+    :type min_block_height: int
+    :return: An iterator of records, the payments with their amount in coins (amount_xmr)
+    :rtype: iterator
+
+    '''
+    pages = wallet.scheduler.chunks(payment_ids) if payment_ids else [[]]
+    for page in pages:
+        with wallet.scheduler.priority(BULK):
+            payments = wallet.get_bulk_payments(page, min_block_height)
+        for payment in payments:
+            yield dict(payment, amount_xmr=atomic_to_coins(payment['amount']))
+
+
+class CSVWriter(object):
+    '''
+    Write records to a CSV file.
+
+    :param path: Path of the CSV file
+    :type path: str
+    :param fields: The columns
+    :type fields: list
+    :param append: Append to the file if it is not empty, e.g. to resume an export, instead of replacing it
+                   (defaults to False)
+    :type append: bool
+
+    '''
+
+    def __init__(self, path, fields, append=False):
+        append = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'a' if append else 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fields, extrasaction='ignore')
+        if not append:
+            self._writer.writeheader()
+
+    def write(self, record):
+        amount = record.get('amount_xmr')
+        if isinstance(amount, Decimal):
+            # fixed point, not the scientific notation of str(Decimal)
+            record = dict(record, amount_xmr='{:f}'.format(amount))
+        self._writer.writerow(record)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter(object):
+    '''
+    Write records to a Parquet file by batches. Needs pyarrow. Parquet files cannot be appended to,
+    so a resumed export must be written to a new file.
+
+    :param path: Path of the Parquet file
+    :type path: str
+    :param fields: The columns
+    :type fields: list
+    :param batch_size: Number of records per row group (defaults to 10000)
+    :type batch_size: int
+    :param append: Whether the export is resumed, in which case the file must not exist (defaults to False)
+    :type append: bool
+    :raises ValueError: if a resumed export would overwrite an existing file
+
+    '''
+
+    def __init__(self, path, fields, batch_size=10000, append=False):
+        if append and os.path.exists(path):
+            # the rows of the previous exports would be lost while the state moves on
+            raise ValueError('Parquet files cannot be appended to, resume the export to a new file: {}'.format(path))
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('pyarrow is needed to export to Parquet: pip3 install pyarrow')
+        self._pyarrow = pyarrow
+        types = {
+            'account_index': pyarrow.uint32(), 'subaddr_index': pyarrow.uint32(), 'global_index': pyarrow.uint64(),
+            'amount': pyarrow.uint64(), 'amount_xmr': pyarrow.decimal128(24, 12), 'spent': pyarrow.bool_(),
+            'tx_size': pyarrow.uint32(), 'block_height': pyarrow.uint64(), 'unlock_time': pyarrow.uint64(),
+        }
+        self._schema = pyarrow.schema([(field, types.get(field, pyarrow.string())) for field in fields])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._batch_size = batch_size
+        self._batch = []
+
+    def write(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= self._batch_size:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        columns = {field: [record.get(field) for record in self._batch] for field in self._schema.names}
+        self._writer.write_table(self._pyarrow.Table.from_pydict(columns, schema=self._schema))
+        self._batch = []
+
+
+WRITERS = {'csv': CSVWriter, 'parquet': ParquetWriter}
+
+
+def export(wallet, kind, path, fmt='csv', state_path=None, accounts=None, payment_ids=None, max_workers=4):
+    '''
+    Export the incoming transfers or the payments of a wallet.
+
+    :param wallet: The wallet
+    :type wallet: monerowallet.MoneroWallet
+    :param kind: What to export ('transfers' or 'payments')
+    :type kind: str
+    :param path: Path of the output file
+    :type path: str
+    :param fmt: The output format ('csv' or 'parquet', defaults to 'csv')
+    :type fmt: str
+    :param state_path: For payments, the file holding the height to resume from, updated once the export is done
+                       (defaults to None, export every payment). A resumed CSV export is appended to the output
+                       file, a resumed Parquet export must be written to a new file; other exports replace it
+    :type state_path: str
+    :param accounts: For transfers, the account indexes (defaults to None, every account)
+    :type accounts: list
+    :param payment_ids: For payments, the payment ids (defaults to None, every payment)
+    :type payment_ids: list
+    :param max_workers: For transfers, the number of accounts fetched at the same time (defaults to 4)
+    :type max_workers: int
+    :return: The number of exported records
+    :rtype: int
+    :raises ValueError: if a resumed Parquet export would overwrite an existing file
+
+    '''
+    resume = False
+    if kind == 'transfers':
+        records = iter_transfers(wallet, accounts, max_workers=max_workers)
+        fields = TRANSFER_FIELDS
+        height = None
+    elif kind == 'payments':
+        min_block_height = 0
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path) as statefile:
+                # the saved height is a block count, its top block was exported last time
+                min_block_height = json.load(statefile)['height'] - 1
+            resume = True
+        # blocks below the wallet height are complete, the next export starts from there
+        height = wallet.getheight()
+        # the blocks the wallet scanned during the export are left to the next one
+        records = (record for record in iter_payments(wallet, payment_ids, min_block_height)
+                   if record['block_height'] < height)
+        fields = PAYMENT_FIELDS
+    else:
+        raise ValueError('Unknown export kind: {}'.format(kind))
+    writer = WRITERS[fmt](path, fields, append=resume)
+    count = 0
+    try:
+        for record in records:
+            writer.write(record)
+            count += 1
+    finally:
+        writer.close()
+    if state_path is not None and height is not None:
+        tmppath = '{}.tmp'.format(state_path)
+        with open(tmppath, 'w') as statefile:
+            json.dump({'height': height}, statefile)
+        os.replace(tmppath, state_path)
+    return count
+
+
+def main(argv=None):
+    '''
+    Entry point of the pymonerowallet-export command.
+    '''
+    parser = argparse.ArgumentParser(prog='pymonerowallet-export', description='Export the history of a Monero wallet')
+    parser.add_argument('output', help='path of the output file')
+    parser.add_argument('--kind', choices=['transfers', 'payments'], default='payments', help='what to export (default: payments)')
+    parser.add_argument('--format', dest='fmt', choices=sorted(WRITERS), default='csv', help='output format (default: csv)')
+    parser.add_argument('--state', dest='state_path', help='state file to resume payments exports from')
+    parser.add_argument('--account', dest='accounts', type=int, action='append', help='account to export transfers of, may be repeated (default: every account)')
+    parser.add_argument('--payment-id', dest='payment_ids', action='append', help='payment id to export payments of, may be repeated (default: every payment)')
+    parser.add_argument('--payment-ids-file', help='file with the payment ids to export payments of, one per line')
+    parser.add_argument('--workers', dest='max_workers', type=int, default=4, help='accounts fetched in parallel (default: 4)')
+    parser.add_argument('--protocol', default='http')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18082)
+    parser.add_argument('--path', default='/json_rpc')
+    parser.add_argument('--rpcuser', default='default')
+    parser.add_argument('--rpcpassword', default='default')
+    args = parser.parse_args(argv)
+    payment_ids = args.payment_ids
+    if args.payment_ids_file is not None:
+        with open(args.payment_ids_file) as idsfile:
+            payment_ids = (payment_ids or []) + [line.strip() for line in idsfile if line.strip()]
+    wallet = MoneroWallet(protocol=args.protocol, host=args.host, port=args.port, path=args.path,
+                          rpcuser=args.rpcuser, rpcpassword=args.rpcpassword)
+    try:
+        count = export(wallet, args.kind, args.output, fmt=args.fmt, state_path=args.state_path,
+                       accounts=args.accounts, payment_ids=payment_ids, max_workers=args.max_workers)
+    except ValueError as err:
+        parser.error(str(err))
+    sys.stderr.write('{} records exported to {}\n'.format(count, args.output))
+    return 0
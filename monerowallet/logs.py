@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``logs`` module
+    =============================
+
+    Logging policy of the RPC requests and results.
+
+    Requests and results are only turned into strings when a handler actually
+    emits the record, large lists are summarized by their number of items and
+    size, payloads are capped, secrets are redacted, and high-volume methods can
+    be sampled. The records carry the rpc_method, rpc_direction and, for results,
+    rpc_status and rpc_bytes attributes for structured log handlers.
+
+    :Example:
+
+    >>> import logging
+    >>> from monerowallet.logs import LogPolicy
+    >>> logging.basicConfig(level=logging.DEBUG)
+    >>> mw = MoneroWallet()
+    >>> mw.log_policy = LogPolicy(max_length=200, sample_rates={'getheight': 0.01})
+    >>> mw.incoming_transfers()
+    DEBUG:monerowallet.rpc:Method: incoming_transfers, params: {'transfer_type': 'all'}
+    DEBUG:monerowallet.rpc:Result: {'jsonrpc': '2.0', 'id': '0', 'result': {'transfers': <list of 18322 items, 2931520 bytes>}}
+
+"""
+# standard library imports
+import json
+import random
+
+REDACTED = '<redacted>'
+
+# parameter and result keys never logged
+SENSITIVE_KEYS = frozenset([
+    'password',
+    'key',
+    'tx_key',
+    'tx_key_list',
+    'tx_blob',
+    'spendkey',
+    'viewkey',
+    'seed',
+    'mnemonic',
+])
+
+# methods whose whole result is never logged
+SENSITIVE_METHODS = frozenset([
+    'query_key',
+])
+
+
+class LogPolicy(object):
+    '''
+    How RPC requests and results are logged.
+
+    :param max_length: Maximum length of a logged payload, in characters (defaults to 1024)
+    :type max_length: int
+    :param max_items: Lists longer than this are logged as a summary (defaults to 10)
+    :type max_items: int
+    :param sample_rates: Fraction of the calls logged, by method; other methods are always logged (defaults to None)
+    :type sample_rates: dict
+
+    '''
+
+    def __init__(self, max_length=1024, max_items=10, sample_rates=None):
+        self.max_length = max_length
+        self.max_items = max_items
+        self.sample_rates = sample_rates or {}
+
+    def sampled(self, method):
+        '''
+        Tell whether a call to a method should be logged.
+        '''
+        rate = self.sample_rates.get(method)
+        return rate is None or random.random() < rate
+
+    def payload(self, method, payload):
+        '''
+        Wrap a payload so that it is only summarized, redacted and capped when formatted.
+
+        :rtype: LazyPayload
+
+        '''
+        return LazyPayload(self, method, payload)
+
+
+class LazyPayload(object):
+    '''
+    A request or result payload formatted on demand by :py:meth:`__str__`.
+    '''
+
+    __slots__ = ('policy', 'method', 'payload')
+
+    def __init__(self, policy, method, payload):
+        self.policy = policy
+        self.method = method
+        self.payload = payload
+
+    def __str__(self):
+        if self.method in SENSITIVE_METHODS:
+            return REDACTED
+        text = str(_summarize(self.payload, self.policy.max_items))
+        if len(text) > self.policy.max_length:
+            text = '{}... <{} characters>'.format(text[:self.policy.max_length], len(text))
+        return text
+
+    __repr__ = __str__
+
+
+class _Summary(object):
+    '''A list logged by its size only'''
+
+    def __init__(self, items):
+        self.count = len(items)
+        self.size = len(json.dumps(items, default=str))
+
+    def __repr__(self):
+        return '<list of {} items, {} bytes>'.format(self.count, self.size)
+
+
+def redact(value):
+    '''
+    Return a copy of a payload with the values of the sensitive keys replaced.
+
+    :param value: The payload
+    :type value: dict or list
+    :return: The redacted payload
+    :rtype: dict or list
+
+    '''
+    if isinstance(value, dict):
+        return {key: REDACTED if key in SENSITIVE_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def _summarize(value, max_items, depth=0):
+    '''Redact sensitive keys and summarize long lists'''
+    if isinstance(value, dict):
+        if depth > 3:
+            return {'...': len(value)}
+        return {
+            key: REDACTED if key in SENSITIVE_KEYS else _summarize(item, max_items, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        if len(value) > max_items:
+            return _Summary(value)
+        return [_summarize(item, max_items, depth + 1) for item in value]
+    return value
+
+
+DEFAULT_POLICY = LogPolicy()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``pool`` module
+    =============================
+
+    Route requests across many wallet RPC servers, e.g. one monero-wallet-rpc
+    process per merchant wallet.
+
+    The wallets of a pool share one HTTP session, hence one connection pool,
+    and one set of worker threads used to send a request to every wallet at once.
+    The connection pool grows with the number of servers, so that connections
+    to every server are kept open.
+
+    :Example:
+
+    >>> from monerowallet.pool import WalletPool
+    >>> pool = WalletPool()
+    >>> pool.add('shop1', port=18082)
+    >>> pool.add('shop2', port=18083)
+    >>> pool.call('shop1', 'getaddress')
+    '94EJSG4URLDVwzAgDvCLaRwFGHxv75DT5MvFp1YfAxQU9icGxjVJiY8Jr9YF1atXN7UFBDx3vJq2s3CzULkPrEAuEioqyrP'
+    >>> pool.fanout('getbalance')
+    {'shop1': {'unlocked_balance': 2262265030000, 'balance': 2262265030000}, 'shop2': {'unlocked_balance': 0, 'balance': 0}}
+
+"""
+# standard library imports
+import asyncio
+import concurrent.futures
+import threading
+
+# 3rd party library imports
+import requests
+
+# our own library imports
+from monerowallet import MoneroWallet
+
+
+class WalletPool(object):
+    '''
+    A set of MoneroWallet objects identified by a key.
+
+    :param max_workers: Maximum number of requests sent at the same time by :py:meth:`fanout` (defaults to 16)
+    :type max_workers: int
+    :param pool_maxsize: Maximum number of connections kept open per RPC server (defaults to 4)
+    :type pool_maxsize: int
+    :param session: The HTTP session shared by the wallets, whose connection pool is then left as is
+                    (defaults to None, a new session)
+    :type session: requests.Session
+
+    '''
+
+    def __init__(self, max_workers=16, pool_maxsize=4, session=None):
+        self.pool_maxsize = pool_maxsize
+        self._adapter = None
+        self._pool_connections = 0
+        self.session = session
+        if session is None:
+            self.session = requests.Session()
+            self._mount(requests.adapters.DEFAULT_POOLSIZE)
+        self._servers = set()
+        self.max_workers = max_workers
+        self._wallets = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._wallets)
+
+    def __contains__(self, key):
+        return key in self._wallets
+
+    def __iter__(self):
+        return iter(list(self._wallets))
+
+    def __getitem__(self, key):
+        return self._wallets[key]
+
+    def add(self, key, wallet=None, **server):
+        '''
+        Add a wallet to the pool.
+
+        :param key: The key identifying the wallet
+        :type key: str
+        :param wallet: The wallet; its session is replaced by the pool one (defaults to None, a wallet is created)
+        :type wallet: MoneroWallet
+        :param server: If no wallet is given, the arguments of the :py:class:`monerowallet.MoneroWallet` to create
+        :return: The wallet
+        :rtype: MoneroWallet
+
+        '''
+        if wallet is None:
+            wallet = MoneroWallet(session=self.session, **server)
+        else:
+            wallet.session = self.session
+        with self._lock:
+            self._wallets[key] = wallet
+            self._update_servers()
+        return wallet
+
+    def _update_servers(self):
+        '''Track the servers of the wallets, and keep a connection pool for every one of them'''
+        self._servers = {(wallet.server['protocol'], wallet.server['host'], wallet.server['port'])
+                         for wallet in self._wallets.values()}
+        if self._adapter is not None and len(self._servers) > self._pool_connections:
+            # the new adapter starts without connections: double its size to replace it rarely
+            self._mount(max(len(self._servers), 2 * self._pool_connections))
+
+    def _mount(self, pool_connections):
+        '''Replace the adapter of the session by one holding pool_connections connection pools'''
+        previous = self._adapter
+        self._adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=self.pool_maxsize)
+        self._pool_connections = pool_connections
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+        if previous is not None:
+            # requests in flight give their connection back to a closed pool, which closes it
+            previous.close()
+
+    def remove(self, key):
+        '''
+        Remove a wallet from the pool.
+
+        :param key: The key identifying the wallet
+        :type key: str
+        :return: The removed wallet
+        :rtype: MoneroWallet
+
+        '''
+        with self._lock:
+            wallet = self._wallets.pop(key)
+            self._update_servers()
+        return wallet
+
+    def call(self, key, method, *args, **kwargs):
+        '''
+        Call a method of one wallet.
+
+        :param key: The key identifying the wallet
+        :type key: str
+        :param method: The name of the :py:class:`monerowallet.MoneroWallet` method
+        :type method: str
+        :return: The result of the method
+
+        '''
+        return getattr(self._wallets[key], method)(*args, **kwargs)
+
+    def fanout(self, method, *args, keys=None, return_exceptions=False, **kwargs):
+        '''
+        Call a method of every wallet concurrently.
+
+        :param method: The name of the :py:class:`monerowallet.MoneroWallet` method
+        :type method: str
+        :param keys: The keys of the wallets to call (defaults to None, every wallet)
+        :type keys: list
+        :param return_exceptions: Return the exceptions raised by the wallets as results instead of raising
+                                  the first one (defaults to False)
+        :type return_exceptions: bool
+        :return: A dictionary with the result of each wallet, by key
+        :rtype: dict
+
+        '''
+        futures = self._submit(method, args, kwargs, keys)
+        return self._collect(futures, return_exceptions)
+
+    async def afanout(self, method, *args, keys=None, return_exceptions=False, **kwargs):
+        '''
+        Coroutine version of :py:meth:`fanout`, not blocking the event loop.
+
+        :Example:
+
+        >>> balances = await pool.afanout('getbalance')
+
+        '''
+        futures = self._submit(method, args, kwargs, keys)
+        if futures:
+            await asyncio.wait([asyncio.wrap_future(future) for future in futures.values()])
+        return self._collect(futures, return_exceptions)
+
+    @staticmethod
+    def merge(results, key_name='wallet'):
+        '''
+        Merge the list results of :py:meth:`fanout` into one list, adding the wallet key to each item.
+        Exceptions returned with return_exceptions are skipped.
+
+        :param results: The result of :py:meth:`fanout`, e.g. for get_bulk_payments or incoming_transfers
+        :type results: dict
+        :param key_name: The name of the item key holding the wallet key (defaults to 'wallet')
+        :type key_name: str
+        :return: The merged list
+        :rtype: list
+
+        :Example:
+
+        >>> pool.merge(pool.fanout('get_bulk_payments', min_block_height=1157950))
+        [{'unlock_time': 0, 'amount': 1000000000, 'tx_hash': 'db3870905ce3c8ca349e224688c344371addca7be4eb36d5dbc61600c8f75726', 'block_height': 1157951, 'payment_id': 'fdfcfd993482b58b', 'wallet': 'shop1'}]
+
+        '''
+        merged = []
+        for key, items in results.items():
+            if isinstance(items, Exception):
+                continue
+            for item in items:
+                merged.append(dict(item, **{key_name: key}))
+        return merged
+
+    def close(self):
+        '''
+        Stop the worker threads and close the connections.
+        '''
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        self.session.close()
+
+    def _submit(self, method, args, kwargs, keys):
+        executor = self._get_executor()
+        return {
+            key: executor.submit(self.call, key, method, *args, **kwargs)
+            for key in (self if keys is None else keys)
+        }
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers)
+            return self._executor
+
+    @staticmethod
+    def _collect(futures, return_exceptions):
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as err:
+                if not return_exceptions:
+                    raise
+                results[key] = err
+        return results
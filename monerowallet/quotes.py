@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``quotes`` module
+    =============================
+
+    Cache of the fees quoted by :py:meth:`monerowallet.MoneroWallet.quote_transfer`.
+
+    The fee of a transaction mostly depends on its priority, its number of
+    destinations and the inputs it spends. Quotes are therefore cached by
+    priority, destination count and input profile (source account and
+    subaddresses, and order of magnitude of the amount), and expire after a
+    number of blocks.
+
+"""
+# standard library imports
+import collections
+import threading
+
+
+class FeeQuoteCache(object):
+    '''
+    Least recently used cache of fee quotes with height based expiry.
+
+    :param ttl_blocks: Number of blocks during which a quote stays valid (defaults to 5)
+    :type ttl_blocks: int
+    :param maxsize: Maximum number of cached quotes (defaults to 1024)
+    :type maxsize: int
+
+    '''
+
+    def __init__(self, ttl_blocks=5, maxsize=1024):
+        self.ttl_blocks = ttl_blocks
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._quotes = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._quotes)
+
+    @staticmethod
+    def key(destinations, priority=0, account_index=0, subaddr_indices=None, mixin=None):
+        '''
+        Build the cache key of a transfer.
+
+        :param destinations: The destinations of the transfer, as given to :py:meth:`monerowallet.MoneroWallet.transfer`
+        :type destinations: list
+        :return: The cache key
+        :rtype: tuple
+
+        '''
+        total = sum(destination['amount'] for destination in destinations)
+        return (priority, len(destinations), account_index, tuple(sorted(subaddr_indices or ())),
+                mixin, total.bit_length())
+
+    def get(self, key, height):
+        '''
+        Return a quote, if it was made less than ttl_blocks blocks before the given height.
+
+        :param key: The cache key, as returned by :py:meth:`key`
+        :type key: tuple
+        :param height: The current height
+        :type height: int
+        :return: The quote, or None
+        :rtype: dict
+
+        '''
+        with self._lock:
+            quote = self._quotes.get(key)
+            if quote is None or not 0 <= height - quote['height'] < self.ttl_blocks:
+                self.misses += 1
+                return None
+            self._quotes.move_to_end(key)
+            self.hits += 1
+            return quote
+
+    def put(self, key, quote):
+        '''
+        Cache a quote, which must have a height key.
+
+        :param key: The cache key, as returned by :py:meth:`key`
+        :type key: tuple
+        :param quote: The quote
+        :type quote: dict
+
+        '''
+        with self._lock:
+            self._quotes[key] = quote
+            self._quotes.move_to_end(key)
+            while len(self._quotes) > self.maxsize:
+                self._quotes.popitem(last=False)
+
+    def clear(self):
+        '''
+        Remove every cached quote.
+        '''
+        with self._lock:
+            self._quotes.clear()
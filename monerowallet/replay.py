@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``replay`` module
+    =============================
+
+    Record the traffic of a client, then replay it offline to measure the
+    throughput and latency of any client configuration.
+
+    * :py:class:`Recorder` logs the request/response pairs of a client, with their
+      timings and sensitive fields redacted, to a gzipped JSON lines file.
+    * :py:class:`ReplayServer` serves the recorded responses locally, at the original
+      or a scaled speed.
+    * :py:func:`replay_load` replays the recorded call mix with N concurrent workers
+      against a client, and returns latency statistics by method. Only read-only
+      methods are replayed, unless told otherwise.
+
+    :Example:
+
+    >>> from monerowallet.replay import Recorder, ReplayServer, replay_load
+    >>> mw = MoneroWallet()
+    >>> recorder = Recorder('traffic.jsonl.gz').attach(mw)
+    >>> # ... production traffic ...
+    >>> recorder.close()
+    >>> server = ReplayServer('traffic.jsonl.gz', speed=1.0).start()
+    >>> stats = replay_load('traffic.jsonl.gz', lambda: MoneroWallet(port=server.port), concurrency=8)
+    >>> stats['methods']['getbalance']
+    {'count': 816, 'errors': 0, 'mean': 0.0131, 'p50': 0.0122, 'p95': 0.0207, 'max': 0.0513}
+
+"""
+# standard library imports
+import collections
+import concurrent.futures
+import gzip
+import http.server
+import json
+import socketserver
+import threading
+import time
+
+# 3rd party library imports
+import requests
+
+# our own library imports
+from monerowallet.logs import REDACTED, SENSITIVE_METHODS, redact
+from monerowallet.replicas import READ_METHODS
+
+# methods replayed by default, which do not change the wallet
+REPLAYED_METHODS = READ_METHODS | frozenset(['getheight'])
+
+
+def _decode(body):
+    '''Decode a JSON body, None if it is not JSON'''
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def read_recording(path):
+    '''
+    Iterate over the records of a recording.
+
+    :param path: Path of the recording
+    :type path: str
+    :return: An iterator of dictionaries with the time offset (t), duration (duration), path, method,
+             redacted request and response, and HTTP status
+    :rtype: iterator
+
+    '''
+    with gzip.open(path, 'rt', encoding='utf-8') as recording:
+        for line in recording:
+            yield json.loads(line)
+
+
+class RecordingAdapter(requests.adapters.BaseAdapter):
+    '''
+    HTTP adapter passing requests through to another adapter and logging them to a :py:class:`Recorder`.
+    The attributes of the wrapped adapter, e.g. its pool manager, are available on the recording adapter.
+
+    :param recorder: The recorder
+    :type recorder: Recorder
+    :param adapter: The adapter sending the requests
+    :type adapter: requests.adapters.BaseAdapter
+
+    '''
+
+    def __init__(self, recorder, adapter):
+        super(RecordingAdapter, self).__init__()
+        self.recorder = recorder
+        self.adapter = adapter
+
+    def __getattr__(self, name):
+        return getattr(self.adapter, name)
+
+    def close(self):
+        self.adapter.close()
+
+    def send(self, request, **kwargs):
+        start = time.monotonic()
+        response = self.adapter.send(request, **kwargs)
+        # digest authentication challenges are part of the transport, not of the call mix
+        if response.status_code != 401:
+            self.recorder.record(request.path_url, _decode(request.body), response.status_code,
+                                 _decode(response.content), start, time.monotonic() - start)
+        return response
+
+
+class Recorder(object):
+    '''
+    Record request/response pairs to a gzipped JSON lines file.
+
+    :param path: Path of the recording
+    :type path: str
+
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        '''
+        Record the requests of a client, by mounting a recording adapter on its session for its server URL.
+        The recording adapter wraps the adapter already serving that URL, so its settings are kept.
+        Other clients sharing the session with the same server are recorded too.
+
+        :param client: The client
+        :type client: monerowallet.rpc.RPCClient
+        :return: The recorder
+        :rtype: Recorder
+
+        '''
+        prefix = '{protocol}://{host}:{port}/'.format(**client.server)
+        adapter = client.session.get_adapter(prefix)
+        if not (isinstance(adapter, RecordingAdapter) and adapter.recorder is self):
+            client.session.mount(prefix, RecordingAdapter(self, adapter))
+        return self
+
+    def record(self, path, request, status, response, start, duration):
+        '''
+        Record one request/response pair, redacting its sensitive fields.
+        '''
+        method = request.get('method', path) if isinstance(request, dict) else path
+        if method in SENSITIVE_METHODS and isinstance(response, dict) and isinstance(response.get('result'), dict):
+            # keep the shape of the result, so that replayed calls still succeed
+            response = dict(response, result={key: REDACTED for key in response['result']})
+        elif method in SENSITIVE_METHODS:
+            response = REDACTED
+        line = json.dumps({
+            't': round(start - self._start, 6),
+            'duration': round(duration, 6),
+            'path': path,
+            'method': method,
+            'request': redact(request),
+            'status': status,
+            'response': redact(response),
+        }, separators=(',', ':'))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._file.write('\n')
+            self.count += 1
+
+    def close(self):
+        '''
+        Flush and close the recording. Requests sent afterwards are not recorded.
+        '''
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+def _request_key(path, request):
+    '''Key matching a replayed request with the recorded ones'''
+    return path, json.dumps(request, sort_keys=True)
+
+
+class ReplayServer(object):
+    '''
+    Local HTTP server answering with the responses of a recording.
+
+    A request is answered with the recorded responses to the same request in turn, or to
+    the same method if the request was not recorded, after the recorded duration divided by
+    speed.
+
+    :param path: Path of the recording
+    :type path: str
+    :param speed: Speed factor of the responses, 0 to answer without delay (defaults to 1.0, original speed)
+    :type speed: float
+    :param host: The address to listen to (defaults to '127.0.0.1')
+    :type host: str
+    :param port: The port to listen to (defaults to 0, a free port)
+    :type port: int
+
+    '''
+
+    def __init__(self, path, speed=1.0, host='127.0.0.1', port=0):
+        self.speed = speed
+        self._by_request = collections.defaultdict(list)
+        self._by_method = collections.defaultdict(list)
+        for record in read_recording(path):
+            self._by_request[_request_key(record['path'], record['request'])].append(record)
+            self._by_method[(record['path'], record['method'])].append(record)
+        self._turns = collections.Counter()
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def lookup(self, path, request):
+        '''
+        Return the record answering a request, or None.
+        '''
+        method = request.get('method', path) if isinstance(request, dict) else path
+        for key, records in ((_request_key(path, request), self._by_request),
+                             ((path, method), self._by_method)):
+            candidates = records.get(key)
+            if candidates:
+                with self._lock:
+                    turn = self._turns[key]
+                    self._turns[key] += 1
+                return candidates[turn % len(candidates)]
+        return None
+
+    def start(self):
+        '''
+        Serve in a background thread.
+
+        :return: The server
+        :rtype: ReplayServer
+
+        '''
+        self._thread = threading.Thread(target=self._server.serve_forever, name='monerowallet-replay', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        '''
+        Stop serving.
+        '''
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        replay = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                request = _decode(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                record = replay.lookup(self.path, request)
+                if record is None:
+                    self.send_error(404, 'Not recorded')
+                    return
+                if replay.speed:
+                    time.sleep(record['duration'] / replay.speed)
+                body = json.dumps(record['response']).encode('utf-8')
+                self.send_response(record['status'])
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def replay_load(path, client_factory, concurrency=1, speed=0, methods=REPLAYED_METHODS):
+    '''
+    Replay the call mix of a recording with concurrent workers, each sending every recorded call
+    of the given methods. The default methods are read-only: pass every method you mean to send
+    again, e.g. transfers, only when the clients point to a replay server or a test wallet.
+
+    :param path: Path of the recording
+    :type path: str
+    :param client_factory: A callable returning the client to send the calls with, called once per worker
+    :type client_factory: callable
+    :param concurrency: Number of concurrent workers (defaults to 1)
+    :type concurrency: int
+    :param speed: Speed factor of the original pacing of the calls, 0 to send them as fast as possible (defaults to 0)
+    :type speed: float
+    :param methods: The methods and endpoints replayed (defaults to REPLAYED_METHODS, the read-only wallet methods)
+    :type methods: set
+    :return: A dictionary with the total number of calls (calls), the number of recorded calls left out by each
+             worker (skipped), the elapsed time (elapsed), the throughput in calls per second (throughput) and
+             latency statistics in seconds by method (methods)
+    :rtype: dict
+
+    '''
+    records = []
+    skipped = 0
+    for record in read_recording(path):
+        if record['method'] in methods:
+            records.append(record)
+        else:
+            skipped += 1
+    latencies = collections.defaultdict(list)
+    errors = collections.Counter()
+    lock = threading.Lock()
+
+    def worker():
+        client = client_factory()
+        start = time.monotonic()
+        for record in records:
+            if speed:
+                delay = record['t'] / speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            request = record['request'] or {}
+            sent = time.monotonic()
+            try:
+                if record['path'] == client.server['path'] and hasattr(client, 'raw_request'):
+                    client.raw_request(request.get('method'), request.get('params', {}))
+                elif record['path'] == client.server['path']:
+                    client._post(request)
+                else:
+                    client._post_endpoint(record['path'], request)
+            except Exception:
+                with lock:
+                    errors[record['method']] += 1
+            with lock:
+                latencies[record['method']].append(time.monotonic() - sent)
+
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.monotonic() - start
+    methods = {}
+    for method, values in latencies.items():
+        values.sort()
+        methods[method] = {
+            'count': len(values),
+            'errors': errors[method],
+            'mean': sum(values) / len(values),
+            'p50': _percentile(values, 0.5),
+            'p95': _percentile(values, 0.95),
+            'max': values[-1],
+        }
+    calls = sum(len(values) for values in latencies.values())
+    return {'calls': calls, 'skipped': skipped, 'elapsed': elapsed, 'throughput': calls / elapsed if elapsed else 0.0, 'methods': methods}
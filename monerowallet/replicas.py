@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``replicas`` module
+    =============================
+
+    Read replicas of a wallet RPC server, e.g. view-only wallets of the same
+    account, to which :py:class:`monerowallet.MoneroWallet` sends its read-only
+    requests.
+
+    The heights of the replicas are checked in a background thread. Until a
+    replica was checked, and while it lags behind the primary, requests go to the
+    primary.
+
+    :Example:
+
+    >>> mw = MoneroWallet(port=18082, replicas=[{'port': 18092}, {'host': '10.0.0.2', 'port': 18082}])
+    >>> mw.getbalance()  # served by the least busy replica
+    {'unlocked_balance': 2262265030000, 'balance': 2262265030000}
+    >>> mw.transfer([{'amount': 10000000, 'address': 'A135xq3GVMdU5qtAm4hN7zjPgz8bRaiSUQmtuDdjZ6CgXayvQruJy3WPe95qj873JhK4YdTQjoR39Leg6esznQk8PckhjRN'}])  # always the primary
+    {'fee': 20141160000, 'tx_blob': '', 'tx_hash': '04cdf47d7927895cde9d3ddf687f70c68bd6fbbd4a21bfd1c669bb3b4b670823', 'tx_key': '150926e63b78f788993cb0efd111c95026ced686735fe0daf3b5cff63fd72b0c'}
+
+"""
+# standard library imports
+import threading
+import time
+
+# methods which may be sent to a replica, every other method goes to the primary;
+# getheight stays on the primary, a lagging replica would make the height go backwards
+READ_METHODS = frozenset([
+    'getbalance',
+    'incoming_transfers',
+    'get_payments',
+    'get_bulk_payments',
+])
+
+# read methods whose result is used as a cursor up to the last height seen on the primary, e.g. the
+# payments since a given block: they are only sent to a replica which was at least at that height
+CURSOR_METHODS = frozenset([
+    'get_bulk_payments',
+])
+
+
+class Replica(object):
+    '''
+    A read replica and its state.
+
+    :ivar server: The server parameters, as in :py:attr:`monerowallet.MoneroWallet.server`
+    :ivar outstanding: The number of requests being sent to the replica
+    :ivar height: The height of the replica at the last check, or None if it was not or could not be checked
+    :ivar usable: False if the replica was not checked yet, lags behind the primary or failed since the last check
+
+    '''
+
+    def __init__(self, server):
+        self.server = server
+        self.outstanding = 0
+        self.height = None
+        self.usable = False
+
+    def __repr__(self):
+        return '<Replica {host}:{port}>'.format(**self.server)
+
+
+class ReplicaSet(object):
+    '''
+    Pick the replica with the least outstanding requests among the ones close enough to the primary.
+
+    :param servers: The server parameters of each replica
+    :type servers: list
+    :param max_lag: Number of blocks a replica may lag behind the primary (defaults to 2)
+    :type max_lag: int
+    :param check_interval: Time between two height checks, in seconds (defaults to 30)
+    :type check_interval: float
+
+    '''
+
+    def __init__(self, servers, max_lag=2, check_interval=30):
+        self.replicas = [Replica(server) for server in servers]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.checked_at = None
+        self.primary_height = None
+        self._stale = False
+        self._rotation = 0
+        self._lock = threading.Lock()
+        self._checking = threading.Lock()
+
+    def __len__(self):
+        return len(self.replicas)
+
+    def __iter__(self):
+        return iter(self.replicas)
+
+    def observe(self, height):
+        '''
+        Record a height of the primary, e.g. returned by its getheight. A height above the ones the
+        replicas were checked against makes the next :py:meth:`check` run without waiting for the
+        check interval.
+
+        :param height: The height of the primary
+        :type height: int
+
+        '''
+        with self._lock:
+            if self.primary_height is None or height > self.primary_height:
+                self.primary_height = height
+                self._stale = True
+
+    def acquire(self, min_height=None):
+        '''
+        Pick a replica and count a request as outstanding on it.
+
+        :param min_height: The lowest height of the replicas which may be picked, as of their last check
+                           (defaults to None, any usable replica)
+        :type min_height: int
+        :return: The replica, or None if no replica is usable
+        :rtype: Replica
+
+        '''
+        with self._lock:
+            # rotate the starting point so that ties are spread over the replicas
+            self._rotation = (self._rotation + 1) % len(self.replicas)
+            rotated = self.replicas[self._rotation:] + self.replicas[:self._rotation]
+            usable = [replica for replica in rotated if replica.usable and
+                      (min_height is None or replica.height >= min_height)]
+            if not usable:
+                return None
+            replica = min(usable, key=lambda replica: replica.outstanding)
+            replica.outstanding += 1
+            return replica
+
+    def release(self, replica, failed=False):
+        '''
+        Count a request to a replica as done. A failed replica is not used until the next check.
+        '''
+        with self._lock:
+            replica.outstanding -= 1
+            if failed:
+                replica.usable = False
+
+    def check(self, getheight, force=False):
+        '''
+        Check the replica heights against the primary height in a background thread, if the check
+        interval elapsed or a new primary height was observed since the last check. Only one check
+        runs at a time, requests go on with the current state meanwhile.
+
+        :param getheight: A callable returning the height of the primary when called without argument,
+                          and of a replica when called with its server parameters
+        :type getheight: callable
+        :param force: Check even if the check interval did not elapse (defaults to False)
+        :type force: bool
+        :return: The checking thread, or None if no check was started
+        :rtype: threading.Thread
+
+        '''
+        now = time.monotonic()
+        if not force and not self._stale and self.checked_at is not None and \
+                now - self.checked_at < self.check_interval:
+            return None
+        if not self._checking.acquire(False):
+            return None
+        thread = threading.Thread(target=self._check, args=(getheight,), name='monerowallet-replicas', daemon=True)
+        try:
+            thread.start()
+        except Exception:
+            self._checking.release()
+            raise
+        return thread
+
+    def _check(self, getheight):
+        '''Check the replica heights, the check lock being held'''
+        try:
+            with self._lock:
+                self._stale = False
+            try:
+                primary_height = getheight()
+            except Exception:
+                # the primary being down is no reason to stop serving reads
+                primary_height = None
+            else:
+                self.observe(primary_height)
+                with self._lock:
+                    self._stale = False
+            heights = {}
+            for replica in self.replicas:
+                try:
+                    heights[replica] = getheight(replica.server)
+                except Exception:
+                    heights[replica] = None
+            with self._lock:
+                for replica, height in heights.items():
+                    replica.height = height
+                    replica.usable = height is not None and \
+                        (primary_height is None or primary_height - height <= self.max_lag)
+                self.checked_at = time.monotonic()
+        finally:
+            self._checking.release()
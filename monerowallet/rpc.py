@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``rpc`` module
+    =============================
+
+    The transport shared by the wallet and daemon clients: building of the
+    JSON-RPC requests, HTTP digest authentication, connection pooling through
+    a requests session, and mapping of the server errors to exceptions.
+    Requests can be timed phase by phase, see :py:mod:`monerowallet.tracing`.
+
+"""
+# standard library imports
+import contextlib
+import json
+import logging
+import time
+
+# 3rd party library imports
+import requests
+
+# our own library imports
+from monerowallet import exceptions
+from monerowallet.logs import DEFAULT_POLICY
+
+_log = logging.getLogger(__name__)
+
+
+class RPCClient(object):
+    '''
+    Base class of the RPC clients.
+
+    :param protocol: Protocol for requesting the RPC server ('http' or 'https')
+    :type protocol: str
+    :param host: The host for requesting the RPC server
+    :type host: str
+    :param port: The port for requesting the RPC server
+    :type port: int
+    :param path: The path of the JSON-RPC endpoint
+    :type path: str
+    :param rpcuser: The username to log in to the RPC server
+    :type rpcuser: str
+    :param rpcpassword: The password to log in to the RPC server
+    :type rpcpassword: str
+    :param session: The HTTP session, which may be shared to share its connection pool (defaults to None, a new session)
+    :type session: requests.Session
+
+    :ivar log_policy: How requests and results are logged, see :py:mod:`monerowallet.logs`
+    :ivar tracer: The :py:class:`monerowallet.tracing.Tracer` collecting the timing of the requests, None to disable tracing
+
+    '''
+
+    log_policy = DEFAULT_POLICY
+    tracer = None
+
+    def __init__(self, protocol, host, port, path, rpcuser, rpcpassword, session=None):
+        self.server = {'protocol': protocol, 'host': host, 'port': port, 'path': path, 'rpcuser': rpcuser, 'rpcpassword': rpcpassword}
+        self.session = session if session is not None else requests.Session()
+
+    @staticmethod
+    def _request(method, params={}):
+        '''Build a JSON-RPC request, leaving out the parameters set to None'''
+        data = {'jsonrpc': '2.0', 'id': '0', 'method': method}
+        validparams = {}
+        for key in params:
+            if params[key] is not None:
+                validparams[key] = params[key]
+        if validparams:
+            data['params'] = validparams
+        return data
+
+    def _post(self, data, server=None):
+        '''Post a JSON-RPC request to a server (defaults to self.server) and return its result'''
+        if server is None:
+            server = self.server
+        with self._traced(server, server['path'], data['method']) as span:
+            result = self._send(server, server['path'], data, data['method'], data.get('params', {}), span)
+
+            # if server-side error is detected, print it
+            if 'error' in result:
+                clock = time.perf_counter()
+                raise _mapped(span, clock, self._error(data, result['error']))
+            # otherwise return result
+            return result['result']
+
+    @staticmethod
+    def _error(data, error):
+        '''Map a JSON-RPC error to an exception'''
+        code = error['code']
+        message = error['message']
+        if code == -32601:
+            return exceptions.MethodNotFoundError(
+                'Unexpected method while requesting the server: {}'.format(
+                    json.dumps(data)))
+        elif code == -32602:
+            return exceptions.InvalidParamsError(
+                'Invalid parameters while requesting the server: {}'.format(
+                    json.dumps(data)))
+        elif code in exceptions._errorcode_to_exception.keys():
+            return exceptions._errorcode_to_exception[code](message)
+        else:
+            return exceptions.Error('Error {code}: {message}'.format(**error))
+
+    def _post_endpoint(self, endpoint, params={}, server=None):
+        '''Post a request to one of the plain JSON endpoints of a server (e.g. /get_height) and return its result'''
+        if server is None:
+            server = self.server
+        with self._traced(server, endpoint, endpoint) as span:
+            result = self._send(server, endpoint, params, endpoint, params, span)
+            status = result.get('status', 'OK')
+            clock = time.perf_counter()
+            if status == 'BUSY':
+                raise _mapped(span, clock, exceptions.DaemonIsBusy('Daemon is busy while requesting {}'.format(endpoint)))
+            elif status != 'OK':
+                raise _mapped(span, clock, exceptions.RPCError('Status {} while requesting {}'.format(status, endpoint)))
+            return result
+
+    @contextlib.contextmanager
+    def _traced(self, server, path, method):
+        '''Trace a request with self.tracer, yielding its span, or None if tracing is disabled'''
+        tracer = self.tracer
+        if tracer is None:
+            yield None
+            return
+        # the pool manager of the server, to time the connections it opens
+        poolmanager = getattr(self.session.get_adapter(_url(server, path)), 'poolmanager', None)
+        span = tracer.start(method, poolmanager)
+        try:
+            yield span
+        except Exception as error:
+            tracer.finish(span, error)
+            raise
+        tracer.finish(span)
+
+    def _send(self, server, path, data, method, params, span=None):
+        '''Send an HTTP request and decode its JSON response, method and params being used for logging, span for tracing'''
+        logged = _log.isEnabledFor(logging.DEBUG) and self.log_policy.sampled(method)
+        if logged:
+            _log.debug("Method: %s, params: %s", method, self.log_policy.payload(method, params),
+                       extra={'rpc_method': method, 'rpc_direction': 'request'})
+        self.headers = {'Content-Type': 'application/json'}
+        body = json.dumps(data)
+        clock = time.perf_counter()
+        try:
+            req = self.session.post(_url(server, path),
+                                    headers=self.headers,
+                                    data=body,
+                                    auth=requests.auth.HTTPDigestAuth(server['rpcuser'], server['rpcpassword'])
+                                    )
+        except requests.exceptions.RequestException:
+            if span is not None:
+                # e.g. a refused or timed out connection, still timed
+                span.exchange(clock, time.perf_counter() - clock, 0.0)
+                span.request_bytes = len(body)
+            raise
+        if span is not None:
+            # the final response of a digest authentication has no elapsed time, the 401 challenges have theirs
+            span.exchange(clock, time.perf_counter() - clock,
+                          sum(r.elapsed.total_seconds() for r in req.history if r.status_code == 401))
+            span.request_bytes = len(body)
+            span.response_bytes = len(req.content)
+            span.status = req.status_code
+
+        clock = time.perf_counter()
+        if req.status_code == 401:
+            raise _mapped(span, clock, exceptions.Unauthorized('401 Unauthorized. Check username and password.'))
+        elif req.status_code != 200:
+            raise _mapped(span, clock, exceptions.HTTPStatusCodeError('Unexpected returned status code: {}'.format(req.status_code)))
+        result = req.json()
+        if span is not None:
+            span.phases['decode'] = time.perf_counter() - clock
+        if logged:
+            _log.debug("Result: %s", self.log_policy.payload(method, result),
+                       extra={'rpc_method': method, 'rpc_direction': 'result',
+                              'rpc_status': req.status_code, 'rpc_bytes': len(req.content)})
+        return result
+
+
+def _url(server, path):
+    '''The URL of a path on a server'''
+    return '{protocol}://{host}:{port}{path}'.format(protocol=server['protocol'], host=server['host'],
+                                                     port=server['port'], path=path)
+
+
+def _mapped(span, clock, error):
+    '''Record the time spent since clock mapping an error to an exception in the span, and return the exception'''
+    if span is not None:
+        span.phases['errors'] += time.perf_counter() - clock
+    return error
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``scheduler`` module
+    =============================
+
+    Client-side scheduling of the requests sent to a wallet RPC server.
+
+    monero-wallet-rpc processes one request at a time. The scheduler hands out
+    the right to send a request by priority class, so that interactive calls do
+    not wait behind a queue of background jobs.
+
+    :Example:
+
+    >>> from monerowallet import scheduler
+    >>> mw = MoneroWallet()
+    >>> with mw.scheduler.priority(scheduler.BULK):
+    ...     transfers = mw.incoming_transfers()
+    >>> mw.scheduler.stats()['bulk']
+    {'served': 1, 'wait_total': 0.0, 'wait_max': 0.0, 'depth': 0}
+
+"""
+# standard library imports
+import collections
+import contextlib
+import threading
+import time
+
+INTERACTIVE = 0
+NORMAL = 1
+BULK = 2
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', NORMAL: 'normal', BULK: 'bulk'}
+
+# priority of the methods when not given explicitly, other methods are NORMAL
+METHOD_PRIORITIES = {
+    'getaddress': INTERACTIVE,
+    'getheight': INTERACTIVE,
+    'make_integrated_address': INTERACTIVE,
+    'split_integrated_address': INTERACTIVE,
+    'make_uri': INTERACTIVE,
+    'incoming_transfers': BULK,
+    'get_bulk_payments': BULK,
+}
+
+
+class _Ticket(object):
+    __slots__ = ('priority', 'enqueued_at', 'event')
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+
+
+class RequestScheduler(object):
+    '''
+    Grant a limited number of concurrent request slots by priority class.
+
+    :param concurrency: Number of requests sent at the same time (defaults to 1)
+    :type concurrency: int
+    :param max_wait: Fairness policy: a request waiting longer than max_wait seconds is served before any
+                     higher priority request; None for strict priorities (defaults to 5)
+    :type max_wait: float
+    :param bulk_chunk_size: Number of items per request when a bulk call is split (defaults to 50)
+    :type bulk_chunk_size: int
+
+    '''
+
+    def __init__(self, concurrency=1, max_wait=5.0, bulk_chunk_size=50):
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.bulk_chunk_size = bulk_chunk_size
+        self._queues = {priority: collections.deque() for priority in PRIORITY_NAMES}
+        self._active = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {priority: {'served': 0, 'wait_total': 0.0, 'wait_max': 0.0} for priority in PRIORITY_NAMES}
+
+    def priority_for(self, method):
+        '''
+        Return the priority of a request: the one set by :py:meth:`priority` in the current
+        thread if any, else the default priority of the method.
+
+        :param method: The RPC method
+        :type method: str
+        :return: The priority class
+        :rtype: int
+
+        '''
+        priority = getattr(self._local, 'priority', None)
+        if priority is not None:
+            return priority
+        return METHOD_PRIORITIES.get(method, NORMAL)
+
+    @contextlib.contextmanager
+    def priority(self, priority):
+        '''
+        Context manager setting the priority of the requests sent by the current thread.
+
+        :param priority: The priority class (INTERACTIVE, NORMAL or BULK)
+        :type priority: int
+
+        '''
+        if priority not in PRIORITY_NAMES:
+            raise ValueError('Unknown priority: {}'.format(priority))
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    @contextlib.contextmanager
+    def slot(self, priority=NORMAL):
+        '''
+        Context manager waiting for the right to send a request.
+
+        :param priority: The priority class of the request (defaults to NORMAL)
+        :type priority: int
+
+        '''
+        ticket = _Ticket(priority)
+        with self._lock:
+            if self._active < self.concurrency and not any(self._queues.values()):
+                self._active += 1
+                ticket.event.set()
+            else:
+                self._queues[priority].append(ticket)
+        ticket.event.wait()
+        wait = time.monotonic() - ticket.enqueued_at
+        with self._lock:
+            stats = self._stats[priority]
+            stats['served'] += 1
+            stats['wait_total'] += wait
+            stats['wait_max'] = max(stats['wait_max'], wait)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            ticket = self._next()
+            if ticket is None:
+                self._active -= 1
+            else:
+                # the slot is handed over, the active count does not change
+                ticket.event.set()
+
+    def _next(self):
+        '''Pop the ticket to serve next, the lock being held'''
+        heads = [queue[0] for queue in self._queues.values() if queue]
+        if not heads:
+            return None
+        if self.max_wait is not None:
+            starving = [ticket for ticket in heads if time.monotonic() - ticket.enqueued_at > self.max_wait]
+            if starving:
+                ticket = min(starving, key=lambda ticket: ticket.enqueued_at)
+                return self._queues[ticket.priority].popleft()
+        ticket = min(heads, key=lambda ticket: ticket.priority)
+        return self._queues[ticket.priority].popleft()
+
+    def chunks(self, items):
+        '''
+        Split a list of items in chunks of bulk_chunk_size.
+
+        :param items: The items to split
+        :type items: list
+        :return: An iterator of lists
+        :rtype: iterator
+
+        '''
+        for start in range(0, len(items), self.bulk_chunk_size):
+            yield items[start:start + self.bulk_chunk_size]
+
+    def stats(self):
+        '''
+        Return the queue depth and wait time statistics of each priority class.
+
+        :return: A dictionary by priority name, with the number of queued requests (depth), the number of
+                 served requests (served), and the total and maximum wait time in seconds (wait_total, wait_max)
+        :rtype: dict
+
+        '''
+        with self._lock:
+            return {
+                name: dict(self._stats[priority], depth=len(self._queues[priority]))
+                for priority, name in PRIORITY_NAMES.items()
+            }
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``snapshot`` module
+    =============================
+
+    Persist the state derived from the wallet (cached RPC results, scanned
+    height and subaddress index) so that a restarted process only has to fetch
+    what changed since the snapshot was written.
+
+    A snapshot file is made of a small uncompressed header holding the wallet
+    address and height, which is enough to validate the snapshot, followed by
+    a zlib compressed body which is only read once the header is accepted::
+
+        magic (4 bytes) | version (1 byte) | height (8 bytes) | address length (2 bytes) | address | body
+
+    :Example:
+
+    >>> mw = MoneroWallet(snapshot_path='/var/lib/shop/wallet.snapshot')
+    >>> snapshot = mw.sync()
+    >>> snapshot.height
+    1146043
+
+"""
+# standard library imports
+import json
+import os
+import struct
+import zlib
+
+# our own library imports
+from monerowallet import base58
+from monerowallet import exceptions
+from monerowallet.subaddress import SubaddressIndex
+
+MAGIC = b'PMWS'
+VERSION = 2
+
+_HEADER = struct.Struct('<4sBQH')
+_COUNT = struct.Struct('<I')
+# major, minor, address length, label length
+_ENTRY = struct.Struct('<IIBH')
+
+
+class Snapshot(object):
+    '''
+    State derived from a wallet at a given height.
+
+    :param address: The main address of the wallet
+    :type address: str
+    :param height: The wallet height the state was fetched at
+    :type height: int
+
+    :ivar subaddresses: The subaddress index
+    :ivar accounts: The last result of :py:meth:`monerowallet.MoneroWallet.get_accounts`
+    :ivar payments: Every incoming payment, as returned by :py:meth:`monerowallet.MoneroWallet.get_bulk_payments`
+    :ivar transfers: Every confirmed transfer, as returned by :py:meth:`monerowallet.MoneroWallet.get_transfers`
+                     for every account: a dictionary with the incoming ('in') and outgoing ('out') transfers
+
+    '''
+
+    def __init__(self, address, height=0):
+        self.address = address
+        self.height = height
+        self.subaddresses = SubaddressIndex()
+        self.accounts = {}
+        self.payments = []
+        self.transfers = {'in': [], 'out': []}
+
+    def save(self, path):
+        '''
+        Write the snapshot to a file. The file is replaced atomically.
+
+        :param path: Path of the snapshot file
+        :type path: str
+
+        '''
+        address = base58.decode(self.address)
+        entries = []
+        count = 0
+        for major, minor, raw, label in self.subaddresses.entries():
+            label = label.encode('utf-8')
+            entries.append(_ENTRY.pack(major, minor, len(raw), len(label)))
+            entries.append(raw)
+            entries.append(label)
+            count += 1
+        results = json.dumps({
+            'accounts': self.accounts,
+            'payments': self.payments,
+            'transfers': self.transfers,
+        }, separators=(',', ':')).encode('utf-8')
+        body = zlib.compress(_COUNT.pack(count) + b''.join(entries) + results)
+        tmppath = '{}.tmp'.format(path)
+        with open(tmppath, 'wb') as snapshotfile:
+            snapshotfile.write(_HEADER.pack(MAGIC, VERSION, self.height, len(address)))
+            snapshotfile.write(address)
+            snapshotfile.write(body)
+        os.replace(tmppath, path)
+
+    @classmethod
+    def load(cls, path, address=None, max_height=None):
+        '''
+        Read a snapshot from a file.
+
+        The header is checked before the body is read, so a snapshot of another
+        wallet, or one more recent than the wallet itself (e.g. after a rescan), is
+        rejected without being decoded.
+
+        :param path: Path of the snapshot file
+        :type path: str
+        :param address: The expected wallet address (defaults to None, not checked)
+        :type address: str
+        :param max_height: The highest acceptable height (defaults to None, not checked)
+        :type max_height: int
+        :return: The snapshot, or None if it does not match address or max_height
+        :rtype: Snapshot
+        :raises monerowallet.exceptions.SnapshotError: if the file is not a valid snapshot
+
+        '''
+        with open(path, 'rb') as snapshotfile:
+            header = snapshotfile.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise exceptions.SnapshotError('Truncated snapshot header: {}'.format(path))
+            magic, version, height, length = _HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise exceptions.SnapshotError('Not a version {} snapshot: {}'.format(VERSION, path))
+            snapshot_address = base58.encode(snapshotfile.read(length))
+            if address is not None and address != snapshot_address:
+                return None
+            if max_height is not None and height > max_height:
+                return None
+            try:
+                body = zlib.decompress(snapshotfile.read())
+            except zlib.error as err:
+                raise exceptions.SnapshotError('Corrupted snapshot {}: {}'.format(path, err))
+        snapshot = cls(snapshot_address, height)
+        try:
+            offset = _COUNT.size
+            for _ in range(_COUNT.unpack_from(body)[0]):
+                major, minor, addrlen, labellen = _ENTRY.unpack_from(body, offset)
+                offset += _ENTRY.size
+                raw = body[offset:offset + addrlen]
+                offset += addrlen
+                label = body[offset:offset + labellen].decode('utf-8')
+                offset += labellen
+                snapshot.subaddresses.add_raw(major, minor, raw, label)
+            results = json.loads(body[offset:].decode('utf-8'))
+            snapshot.accounts = results['accounts']
+            snapshot.payments = results['payments']
+            snapshot.transfers = results['transfers']
+        except (struct.error, ValueError, KeyError, TypeError) as err:
+            raise exceptions.SnapshotError('Corrupted snapshot {}: {}'.format(path, err))
+        return snapshot
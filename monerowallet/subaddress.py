@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``subaddress`` module
+    =============================
+
+    In-memory index of the wallet subaddresses, mapping addresses to their
+    (account, index) pair and back in constant time.
+
+    Addresses are stored in their decoded binary form (69 bytes instead of a
+    95 characters string), back to back in a single buffer, and the indexes are
+    packed in a single 64 bits integer. Both directions are open addressing hash
+    tables of slot numbers held in arrays, so an entry takes about 120 bytes and
+    millions of subaddresses fit in a few hundred megabytes.
+
+    :Example:
+
+    >>> mw = MoneroWallet()
+    >>> mw.subaddresses.lookup('BcUqEB1xnpBV2T3E9oYRwgGSzCGTEkDGD3zAEW1on9UMXBoRT7PBZfLTWjA6wgfHc824C6JxRT5N7GN74X3EehApQT4FbHR')
+    (0, 2, '(Untitled address)')
+    >>> mw.subaddresses.address(0, 2)
+    'BcUqEB1xnpBV2T3E9oYRwgGSzCGTEkDGD3zAEW1on9UMXBoRT7PBZfLTWjA6wgfHc824C6JxRT5N7GN74X3EehApQT4FbHR'
+
+"""
+# standard library imports
+import array
+import threading
+
+# our own library imports
+from monerowallet import base58
+
+# size of a decoded standard address or subaddress
+ADDRESS_SIZE = 69
+
+_FREE = 0xffffffffffffffff
+_EMPTY = -1
+_DELETED = -2
+_MASK64 = 0xffffffffffffffff
+_FIBONACCI = 0x9e3779b97f4a7c15
+
+
+def _pack(major, minor):
+    return (major << 32) | minor
+
+
+def _unpack(key):
+    return key >> 32, key & 0xffffffff
+
+
+class SubaddressIndex(object):
+    '''
+    Two-way index between subaddresses and their (major, minor) indexes.
+
+    The index is safe to use from several threads.
+
+    :Example:
+
+    >>> index = SubaddressIndex()
+    >>> index.add(0, 1, 'BcUqEB1xnpBV2T3E9oYRwgGSzCGTEkDGD3zAEW1on9UMXBoRT7PBZfLTWjA6wgfHc824C6JxRT5N7GN74X3EehApQT4FbHR', 'shop')
+    >>> len(index)
+    1
+
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # slot i holds the address at _raw[i * ADDRESS_SIZE:(i + 1) * ADDRESS_SIZE] and the packed indexes _keys[i]
+        self._raw = bytearray()
+        self._keys = array.array('Q')
+        self._free = []
+        self._labels = {}
+        self._count = 0
+        # highest minor index by account, recomputed when its entry is removed
+        self._max_minors = {}
+        # hash tables of slot numbers, by address and by packed indexes
+        self._bits = 3
+        self._by_address = array.array('q', [_EMPTY]) * (1 << self._bits)
+        self._by_key = array.array('q', [_EMPTY]) * (1 << self._bits)
+        self._deleted = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, address):
+        try:
+            raw = base58.decode(address)
+        except ValueError:
+            return False
+        with self._lock:
+            return self._find_address(raw)[1] is not None
+
+    def add(self, major, minor, address, label=None):
+        '''
+        Add or replace a subaddress in the index.
+
+        :param major: Index of the account
+        :type major: int
+        :param minor: Index of the subaddress within the account
+        :type minor: int
+        :param address: The subaddress
+        :type address: str
+        :param label: Label of the subaddress
+        :type label: str
+
+        '''
+        self.add_raw(major, minor, base58.decode(address), label)
+
+    def add_raw(self, major, minor, raw, label=None):
+        '''
+        Add a subaddress already in its binary form, as returned by :py:meth:`entries`.
+        '''
+        if len(raw) != ADDRESS_SIZE:
+            raise ValueError('Not a {} bytes address: {} bytes'.format(ADDRESS_SIZE, len(raw)))
+        raw = bytes(raw)
+        key = _pack(major, minor)
+        with self._lock:
+            slot = self._find_key(key)[1]
+            moved = self._find_address(raw)[1]
+            if slot is None or moved != slot:
+                # the address leaves its previous indexes, the indexes their previous address
+                for previous in set((slot, moved)) - set([None]):
+                    self._remove(previous)
+                self._insert(key, raw)
+            if label:
+                self._labels[key] = label
+            else:
+                self._labels.pop(key, None)
+
+    def set_label(self, major, minor, label):
+        '''
+        Change the label of an indexed subaddress. Unknown subaddresses are ignored.
+
+        :param major: Index of the account
+        :type major: int
+        :param minor: Index of the subaddress within the account
+        :type minor: int
+        :param label: New label of the subaddress
+        :type label: str
+
+        '''
+        key = _pack(major, minor)
+        with self._lock:
+            if self._find_key(key)[1] is None:
+                return
+            if label:
+                self._labels[key] = label
+            else:
+                self._labels.pop(key, None)
+
+    def lookup(self, address):
+        '''
+        Find the account index, subaddress index and label of an address.
+
+        :param address: The subaddress to look for
+        :type address: str
+        :return: A tuple (major, minor, label), or None if the address is unknown
+        :rtype: tuple
+
+        '''
+        try:
+            raw = base58.decode(address)
+        except ValueError:
+            return None
+        with self._lock:
+            slot = self._find_address(raw)[1]
+            if slot is None:
+                return None
+            key = self._keys[slot]
+            major, minor = _unpack(key)
+            return major, minor, self._labels.get(key, '')
+
+    def address(self, major, minor):
+        '''
+        Find the subaddress at the given indexes.
+
+        :param major: Index of the account
+        :type major: int
+        :param minor: Index of the subaddress within the account
+        :type minor: int
+        :return: The subaddress, or None if it is not indexed
+        :rtype: str
+
+        '''
+        with self._lock:
+            slot = self._find_key(_pack(major, minor))[1]
+            if slot is None:
+                return None
+            raw = self._slot_address(slot)
+        return base58.encode(raw)
+
+    def max_minor(self, major):
+        '''
+        Find the highest indexed subaddress index of an account.
+
+        :param major: Index of the account
+        :type major: int
+        :return: The highest subaddress index, or None if no subaddress of the account is indexed
+        :rtype: int
+
+        '''
+        with self._lock:
+            if major not in self._max_minors:
+                minors = [key & 0xffffffff for key in self._keys if key != _FREE and key >> 32 == major]
+                if not minors:
+                    return None
+                self._max_minors[major] = max(minors)
+            return self._max_minors[major]
+
+    def entries(self):
+        '''
+        Iterate over the indexed subaddresses.
+
+        :return: An iterator of (major, minor, raw address, label) tuples, the address being in its binary form
+        :rtype: iterator
+
+        '''
+        with self._lock:
+            raw = bytes(self._raw)
+            keys = self._keys[:]
+            labels = dict(self._labels)
+        for slot, key in enumerate(keys):
+            if key != _FREE:
+                major, minor = _unpack(key)
+                yield major, minor, raw[slot * ADDRESS_SIZE:(slot + 1) * ADDRESS_SIZE], labels.get(key, '')
+
+    def clear(self):
+        '''
+        Remove every subaddress from the index.
+        '''
+        with self._lock:
+            self._reset()
+
+    def _slot_address(self, slot):
+        return bytes(self._raw[slot * ADDRESS_SIZE:(slot + 1) * ADDRESS_SIZE])
+
+    def _bucket(self, value):
+        '''First bucket of a hash value, by Fibonacci hashing'''
+        return ((value * _FIBONACCI) & _MASK64) >> (64 - self._bits)
+
+    def _probe(self, table, value, match):
+        '''Return the (bucket, slot) of the entry of a table matching a value, or (first free bucket, None)'''
+        mask = len(table) - 1
+        bucket = self._bucket(value)
+        free = None
+        while True:
+            slot = table[bucket]
+            if slot == _EMPTY:
+                return (bucket if free is None else free), None
+            if slot == _DELETED:
+                if free is None:
+                    free = bucket
+            elif match(slot):
+                return bucket, slot
+            bucket = (bucket + 1) & mask
+
+    def _find_address(self, raw):
+        return self._probe(self._by_address, hash(raw) & _MASK64, lambda slot: self._slot_address(slot) == raw)
+
+    def _find_key(self, key):
+        return self._probe(self._by_key, key, lambda slot: self._keys[slot] == key)
+
+    def _insert(self, key, raw):
+        '''Store a new entry, whose address and indexes are not in the index'''
+        if (self._count + self._deleted + 1) * 2 > len(self._by_key):
+            self._rehash(self._count + 1)
+        if self._free:
+            slot = self._free.pop()
+            self._raw[slot * ADDRESS_SIZE:(slot + 1) * ADDRESS_SIZE] = raw
+            self._keys[slot] = key
+        else:
+            slot = len(self._keys)
+            self._raw += raw
+            self._keys.append(key)
+        self._by_address[self._find_address(raw)[0]] = slot
+        self._by_key[self._find_key(key)[0]] = slot
+        self._count += 1
+        major, minor = _unpack(key)
+        if minor > self._max_minors.get(major, -1):
+            self._max_minors[major] = minor
+
+    def _remove(self, slot):
+        '''Free the slot of an entry'''
+        key = self._keys[slot]
+        self._by_address[self._find_address(self._slot_address(slot))[0]] = _DELETED
+        self._by_key[self._find_key(key)[0]] = _DELETED
+        self._labels.pop(key, None)
+        major, minor = _unpack(key)
+        if self._max_minors.get(major) == minor:
+            del self._max_minors[major]
+        self._keys[slot] = _FREE
+        self._free.append(slot)
+        self._count -= 1
+        self._deleted += 1
+
+    def _rehash(self, count):
+        '''Rebuild the hash tables, at most half full with count entries, without deleted markers'''
+        self._bits = max(3, (count * 2 - 1).bit_length())
+        self._by_address = array.array('q', [_EMPTY]) * (1 << self._bits)
+        self._by_key = array.array('q', [_EMPTY]) * (1 << self._bits)
+        self._deleted = 0
+        for slot, key in enumerate(self._keys):
+            if key != _FREE:
+                self._by_address[self._find_address(self._slot_address(slot))[0]] = slot
+                self._by_key[self._find_key(key)[0]] = slot
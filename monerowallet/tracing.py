@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``tracing`` module
+    =============================
+
+    Per-phase timing of the RPC requests.
+
+    Each request is traced as a :py:class:`Span` timing its phases separately:
+
+    * ``connect``: opening of connections to the server, new or dropped (TCP, and TLS for https)
+    * ``auth``: the HTTP digest authentication challenge, the 401 round trip preceding the request
+    * ``server``: sending of the request, processing by the server and reading of the response
+    * ``decode``: JSON decoding of the response
+    * ``errors``: mapping of the errors returned by the server to exceptions
+
+    Spans are kept in a ring buffer, and exported to OpenTelemetry when it is
+    installed. Tracing is disabled unless a :py:class:`Tracer` is set on the client.
+
+    :Example:
+
+    >>> from monerowallet.tracing import Tracer
+    >>> mw = MoneroWallet()
+    >>> mw.tracer = Tracer()
+    >>> mw.getbalance()
+    {'balance': 224916129245183, 'unlocked_balance': 224916129245183}
+    >>> mw.tracer.print_breakdown()
+    method                  calls     total   connect      auth    server    decode    errors
+    getbalance                  1  812.31ms    0.21ms    2.04ms  809.87ms    0.17ms    0.00ms
+
+"""
+# standard library imports
+import collections
+import functools
+import sys
+import threading
+import time
+
+PHASES = ('connect', 'auth', 'server', 'decode', 'errors')
+
+_local = threading.local()
+_timed_classes = {}
+
+
+class Span(object):
+    '''
+    The timing of one request, in seconds.
+
+    :ivar method: The RPC method, or the endpoint for plain JSON endpoints
+    :ivar start: The time the request started at, as returned by time.time()
+    :ivar duration: The total duration of the request
+    :ivar phases: The duration of each phase, by name
+    :ivar request_bytes: The size of the request body
+    :ivar response_bytes: The size of the response body, None if no response was received
+    :ivar status: The HTTP status code, None if no response was received
+    :ivar error: The name of the exception raised, None if the request succeeded
+
+    '''
+
+    __slots__ = ('method', 'start', 'duration', 'phases', 'request_bytes', 'response_bytes', 'status', 'error',
+                 '_clock', '_connects')
+
+    def __init__(self, method):
+        self.method = method
+        self.start = time.time()
+        self.duration = None
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.request_bytes = 0
+        self.response_bytes = None
+        self.status = None
+        self.error = None
+        self._clock = time.perf_counter()
+        self._connects = []
+
+    def exchange(self, clock, elapsed, challenges):
+        '''
+        Split the time of the HTTP exchange of the request into the connect, auth and server phases.
+
+        :param clock: The time.perf_counter() value before the exchange
+        :type clock: float
+        :param elapsed: The duration of the exchange
+        :type elapsed: float
+        :param challenges: The duration of the authentication challenges, the 401 responses preceding the final one
+        :type challenges: float
+
+        '''
+        # connections opened during the challenge are not part of the auth phase
+        auth_connects = sum(duration for start, duration in self._connects if start < clock + challenges)
+        connects = sum(duration for start, duration in self._connects)
+        self.phases['connect'] += connects
+        self.phases['auth'] += max(0.0, challenges - auth_connects)
+        self.phases['server'] += max(0.0, elapsed - challenges - (connects - auth_connects))
+
+    def __repr__(self):
+        return '<Span {} {}>'.format(self.method, ' '.join(
+            '{}={:.2f}ms'.format(phase, self.phases[phase] * 1000) for phase in PHASES))
+
+
+class Tracer(object):
+    '''
+    Collect the spans of the requests in a ring buffer, and export them to OpenTelemetry if it is installed.
+
+    :param maxlen: Number of spans kept (defaults to 1000)
+    :type maxlen: int
+    :param otel: Whether to export to OpenTelemetry (defaults to None, if it is installed)
+    :type otel: bool
+
+    '''
+
+    def __init__(self, maxlen=1000, otel=None):
+        self._spans = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._otel = None
+        if otel or otel is None:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                if otel:
+                    raise ImportError('opentelemetry is needed to export spans: pip3 install opentelemetry-api')
+            else:
+                self._otel = trace
+
+    def start(self, method, poolmanager=None):
+        '''
+        Start the span of a request sent from this thread.
+
+        :param method: The RPC method
+        :type method: str
+        :param poolmanager: The urllib3 pool manager sending the request, to time the connections it opens (defaults to None)
+        :type poolmanager: urllib3.PoolManager
+        :return: The span
+        :rtype: Span
+
+        '''
+        if poolmanager is not None and not getattr(poolmanager, '_monerowallet_timed', False):
+            _instrument(poolmanager)
+        span = Span(method)
+        _local.span = span
+        return span
+
+    def finish(self, span, error=None):
+        '''
+        End a span, and export it.
+
+        :param span: The span
+        :type span: Span
+        :param error: The exception raised by the request (defaults to None)
+        :type error: Exception
+
+        '''
+        span.duration = time.perf_counter() - span._clock
+        if error is not None:
+            span.error = type(error).__name__
+        if getattr(_local, 'span', None) is span:
+            _local.span = None
+        with self._lock:
+            self._spans.append(span)
+        if self._otel is not None:
+            self._export(span)
+
+    def spans(self, method=None):
+        '''
+        Return the spans in the buffer, oldest first.
+
+        :param method: Only return the spans of this method (defaults to None, every method)
+        :type method: str
+        :rtype: list
+
+        '''
+        with self._lock:
+            spans = list(self._spans)
+        return [span for span in spans if method is None or span.method == method]
+
+    def slowest(self, count=10):
+        '''
+        Return the slowest spans in the buffer, slowest first.
+
+        :param count: Number of spans (defaults to 10)
+        :type count: int
+        :rtype: list
+
+        '''
+        return sorted(self.spans(), key=lambda span: span.duration, reverse=True)[:count]
+
+    def breakdown(self, count=10):
+        '''
+        Average the phases of the slowest spans, by method.
+
+        :param count: Number of slowest spans averaged (defaults to 10)
+        :type count: int
+        :return: A dictionary with, by method, the number of calls (calls), the mean total duration (total)
+                 and the mean duration of each phase, in seconds, slowest methods first
+        :rtype: collections.OrderedDict
+
+        '''
+        groups = collections.OrderedDict()
+        for span in self.slowest(count):
+            groups.setdefault(span.method, []).append(span)
+        result = collections.OrderedDict()
+        for method, spans in groups.items():
+            result[method] = {'calls': len(spans), 'total': sum(span.duration for span in spans) / len(spans)}
+            for phase in PHASES:
+                result[method][phase] = sum(span.phases[phase] for span in spans) / len(spans)
+        return result
+
+    def print_breakdown(self, count=10, file=None):
+        '''
+        Print the per-method phase breakdown of the slowest spans, see :py:meth:`breakdown`.
+
+        :param count: Number of slowest spans (defaults to 10)
+        :type count: int
+        :param file: Where to print (defaults to None, sys.stdout)
+        :type file: file
+
+        '''
+        file = sys.stdout if file is None else file
+        columns = ('total',) + PHASES
+        file.write('{:<22}{:>7}{}\n'.format('method', 'calls', ''.join('{:>10}'.format(column) for column in columns)))
+        for method, row in self.breakdown(count).items():
+            file.write('{:<22}{:>7}{}\n'.format(method, row['calls'], ''.join(
+                '{:>10}'.format('{:.2f}ms'.format(row[column] * 1000)) for column in columns)))
+
+    def clear(self):
+        '''
+        Empty the buffer.
+        '''
+        with self._lock:
+            self._spans.clear()
+
+    def _export(self, span):
+        '''Export a span and one child span by phase to OpenTelemetry'''
+        tracer = self._otel.get_tracer('monerowallet')
+        start = int(span.start * 1e9)
+        attributes = {'rpc.system': 'jsonrpc', 'rpc.method': span.method, 'monerowallet.request_bytes': span.request_bytes}
+        if span.status is not None:
+            attributes['http.status_code'] = span.status
+        if span.response_bytes is not None:
+            attributes['monerowallet.response_bytes'] = span.response_bytes
+        if span.error is not None:
+            attributes['error.type'] = span.error
+        parent = tracer.start_span(span.method, start_time=start, attributes=attributes)
+        context = self._otel.set_span_in_context(parent)
+        offset = start
+        for phase in PHASES:
+            duration = int(span.phases[phase] * 1e9)
+            if duration:
+                child = tracer.start_span(phase, context=context, start_time=offset)
+                child.end(end_time=offset + duration)
+                offset += duration
+        parent.end(end_time=start + int(span.duration * 1e9))
+
+
+def _instrument(poolmanager):
+    '''Make the connection pools of a urllib3 pool manager, current and future, time the connections they open'''
+    for key in list(poolmanager.pools.keys()):
+        pool = poolmanager.pools.get(key)
+        if pool is not None and not getattr(pool, '_monerowallet_timed', False):
+            pool._make_request = functools.partial(_timed_make_request, pool._make_request)
+            pool._monerowallet_timed = True
+    poolmanager.pool_classes_by_scheme = {
+        scheme: _timed_pool(cls) for scheme, cls in poolmanager.pool_classes_by_scheme.items()
+    }
+    poolmanager._monerowallet_timed = True
+
+
+def _timed_make_request(make_request, conn, *args, **kwargs):
+    '''Open the connection of a request if it is closed, new or dropped since its last use, timing it for the span of the thread'''
+    span = getattr(_local, 'span', None)
+    if span is not None and getattr(conn, 'sock', None) is None:
+        start = time.perf_counter()
+        try:
+            conn.connect()
+        finally:
+            span._connects.append((start, time.perf_counter() - start))
+    return make_request(conn, *args, **kwargs)
+
+
+def _timed_pool(cls):
+    '''Subclass of a urllib3 connection pool class timing the connections it opens'''
+    if getattr(cls, '_monerowallet_timed', False):
+        return cls
+    if cls not in _timed_classes:
+        def _make_request(self, conn, *args, **kwargs):
+            return _timed_make_request(super(timed, self)._make_request, conn, *args, **kwargs)
+
+        timed = type(cls.__name__, (cls,), {'_make_request': _make_request, '_monerowallet_timed': True})
+        _timed_classes[cls] = timed
+    return _timed_classes[cls]
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+"""
+    The ``watcher`` module
+    =============================
+
+    Watch the wallet height with a single poller shared by every subscriber.
+
+    The poller adapts its interval to the Monero block time: it polls quickly
+    around the moment the next block is expected, and backs off in between.
+
+    :Example:
+
+    >>> from monerowallet.watcher import payments_since
+    >>> mw = MoneroWallet()
+    >>> mw.watcher.chain('payments', payments_since)
+    >>> mw.watcher.subscribe(lambda event: print(event.height, event.fetched['payments']))
+    >>> mw.watcher.start()
+    1146044 [{'unlock_time': 0, 'amount': 1000000000, 'tx_hash': 'db3870905ce3c8ca349e224688c344371addca7be4eb36d5dbc61600c8f75726', 'block_height': 1146043, 'payment_id': 'fdfcfd993482b58b'}]
+
+"""
+# standard library imports
+import asyncio
+import logging
+import threading
+import time
+
+_log = logging.getLogger(__name__)
+
+# Monero target block time, in seconds
+BLOCK_TIME = 120
+
+
+def payments_since(wallet, previous, height):
+    '''
+    Chained fetch returning the payments received in the new blocks.
+
+    :param wallet: The watched wallet
+    :type wallet: monerowallet.MoneroWallet
+    :param previous: The previous height, None on the first event
+    :type previous: int
+    :param height: The new height
+    :type height: int
+    :return: A list of dictionaries with the details of the incoming payments
+    :rtype: list
+
+    '''
+    if previous is None:
+        return []
+    # heights are block counts, and the server only returns the payments above min_block_height:
+    # previous - 1 is the top block already seen
+    return wallet.get_bulk_payments(min_block_height=previous - 1)
+
+
+class HeightEvent(object):
+    '''
+    A change of the wallet height.
+
+    :ivar height: The new height
+    :ivar previous: The previous height, None on the first event
+    :ivar fetched: A dictionary with the result of each chained fetch, by name
+
+    '''
+
+    def __init__(self, height, previous, fetched=None):
+        self.height = height
+        self.previous = previous
+        self.fetched = fetched or {}
+
+    def __repr__(self):
+        return '<HeightEvent {} -> {}>'.format(self.previous, self.height)
+
+
+class HeightWatcher(object):
+    '''
+    Poll the height of a wallet and notify subscribers when it changes.
+
+    :param wallet: The wallet to watch
+    :type wallet: monerowallet.MoneroWallet
+    :param min_interval: Polling interval around the expected block time, in seconds (defaults to 2)
+    :type min_interval: float
+    :param max_interval: Longest polling interval, in seconds (defaults to 30)
+    :type max_interval: float
+    :param block_time: Expected time between two blocks, in seconds (defaults to 120)
+    :type block_time: float
+    :param window: Time around the expected block time during which the poller runs fast, in seconds (defaults to 20)
+    :type window: float
+
+    '''
+
+    def __init__(self, wallet, min_interval=2, max_interval=30, block_time=BLOCK_TIME, window=20):
+        self.wallet = wallet
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.block_time = block_time
+        self.window = window
+        self.height = None
+        self.changed_at = None
+        self._subscribers = []
+        self._fetches = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        '''
+        Register a callback receiving a :py:class:`HeightEvent` on each height change.
+        Callbacks are run in the poller thread.
+
+        :param callback: The callback
+        :type callback: callable
+        :return: The callback, so this method can be used as a decorator
+        :rtype: callable
+
+        '''
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        '''
+        Remove a callback registered with :py:meth:`subscribe`.
+        '''
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def chain(self, name, fetch):
+        '''
+        Register a fetch run once per height change, before subscribers are notified.
+        Its result is available as ``event.fetched[name]``. If it raises, the height change
+        is delivered at a later poll, with every fetch run again from the same previous height.
+
+        :param name: Name of the fetched data
+        :type name: str
+        :param fetch: A callable taking the wallet, the previous height and the new height
+        :type fetch: callable
+
+        '''
+        with self._lock:
+            self._fetches.append((name, fetch))
+
+    def events(self):
+        '''
+        Subscribe with an asynchronous iterator of :py:class:`HeightEvent`. Must be called
+        from the event loop the events are consumed in.
+
+        :return: An asynchronous iterator, which is also an asynchronous context manager unsubscribing on exit
+        :rtype: HeightEvents
+
+        :Example:
+
+        >>> async with mw.watcher.events() as events:
+        ...     async for event in events:
+        ...         print(event.height)
+        1146044
+
+        '''
+        return HeightEvents(self, asyncio.get_event_loop())
+
+    def poll(self):
+        '''
+        Query the wallet height once, and notify subscribers if it changed.
+
+        If a chained fetch fails, subscribers are not notified and the height is not updated,
+        so that the next poll fetches the same blocks again.
+
+        :return: The event, or None if the height did not change or a chained fetch failed
+        :rtype: HeightEvent
+
+        '''
+        height = self.wallet.getheight()
+        if height == self.height:
+            return None
+        previous = self.height
+        with self._lock:
+            fetches = list(self._fetches)
+            subscribers = list(self._subscribers)
+        event = HeightEvent(height, previous)
+        for name, fetch in fetches:
+            try:
+                event.fetched[name] = fetch(self.wallet, previous, height)
+            except Exception:
+                _log.exception("Chained fetch {0} failed at height {1}, retrying at the next poll".format(name, height))
+                return None
+        self.height = height
+        self.changed_at = time.monotonic()
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                _log.exception("Height subscriber {0!r} failed".format(callback))
+        return event
+
+    def next_interval(self, now=None):
+        '''
+        Compute how long to wait before the next poll.
+
+        :param now: Current value of :py:func:`time.monotonic` (defaults to None, read the clock)
+        :type now: float
+        :return: The interval, in seconds
+        :rtype: float
+
+        '''
+        if self.changed_at is None:
+            return self.min_interval
+        if now is None:
+            now = time.monotonic()
+        elapsed = now - self.changed_at
+        window_start = self.block_time - self.window
+        if elapsed < window_start:
+            # the next block is not due yet: sleep until the window opens
+            interval = window_start - elapsed
+        else:
+            # back off as the block gets late
+            overdue = max(0, elapsed - self.block_time - self.window)
+            interval = self.min_interval * (1 + overdue / self.window)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    @property
+    def running(self):
+        '''
+        True if the poller thread is running.
+        '''
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        '''
+        Start the poller thread, if not already running.
+        '''
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='monerowallet-height-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        '''
+        Stop the poller thread and wait for it to exit.
+        '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as err:
+                _log.warning("Height poll failed: {0}".format(err))
+            self._stop.wait(self.next_interval())
+
+
+class HeightEvents(object):
+    '''
+    Asynchronous iterator over the height events of a :py:class:`HeightWatcher`.
+    Returned by :py:meth:`HeightWatcher.events`.
+    '''
+
+    def __init__(self, watcher, loop):
+        self._watcher = watcher
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        watcher.subscribe(self._push)
+
+    def _push(self, event):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def close(self):
+        '''
+        Stop receiving events.
+        '''
+        self._watcher.unsubscribe(self._push)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._queue.get()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
@@ -44,5 +44,9 @@ setup(
     download_url='https://github.com/chaica/pymonerowallet',
     packages=['monerowallet','monerowallet.exceptions'],
     install_requires=['requests'],
+    extras_require={'parquet': ['pyarrow'], 'opentelemetry': ['opentelemetry-api']},
+    entry_points={
+        'console_scripts': ['pymonerowallet-export = monerowallet.export:main'],
+    },
     test_suite = 'tests',
 )
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the monerowallet.affinity module'''
+
+# standard library imports
+import collections
+import time
+import unittest
+
+# our own library imports
+from monerowallet.affinity import WalletAffinityScheduler, _Call, longest_queue, oldest_deadline
+
+
+class FakeWallet(object):
+    '''Wallet recording the calls run by the scheduler'''
+
+    def __init__(self):
+        self.open_wallet_name = None
+        self.calls = []
+
+    def open_wallet(self, filename, password):
+        self.open_wallet_name = filename
+
+    def getbalance(self):
+        self.calls.append((self.open_wallet_name, 'getbalance'))
+        return self.open_wallet_name
+
+
+def queues(**deadlines):
+    '''Queues of calls with the given deadlines, in seconds from now, by wallet file name'''
+    now = time.monotonic()
+    return collections.OrderedDict(
+        (filename, collections.deque(_Call('getbalance', (), {}, now + deadline) for deadline in values))
+        for filename, values in deadlines.items())
+
+
+class TestPolicies(unittest.TestCase):
+    '''Tests of the switch policies'''
+
+    def test_longest_queue(self):
+        '''The wallet with the most queued calls is served, the open wallet winning ties'''
+        self.assertEqual(longest_queue(queues(a=[60], b=[60, 60]), 'a'), 'b')
+        self.assertEqual(longest_queue(queues(a=[60, 60], b=[60, 60]), 'b'), 'b')
+
+    def test_longest_queue_overdue(self):
+        '''A wallet with an overdue call is served before longer queues'''
+        self.assertEqual(longest_queue(queues(busy=[60, 60, 60], quiet=[-1]), 'busy'), 'quiet')
+        self.assertEqual(longest_queue(queues(busy=[-2, 60, 60], quiet=[-1]), 'quiet'), 'busy')
+
+    def test_oldest_deadline(self):
+        '''The wallet with the earliest deadline is served'''
+        self.assertEqual(oldest_deadline(queues(a=[30, 5], b=[10, 10, 10]), 'b'), 'a')
+
+
+class TestWalletAffinityScheduler(unittest.TestCase):
+    '''Tests of the scheduler, run in the current thread'''
+
+    def setUp(self):
+        self.wallet = FakeWallet()
+        self.affinity = WalletAffinityScheduler(self.wallet, max_batch=2)
+        self.affinity.register('shop1', 'password1')
+        self.affinity.register('shop2', 'password2')
+
+    def test_batches(self):
+        '''Calls are run by wallet, the wallet being opened once per batch'''
+        futures = [self.affinity.submit('shop1', 'getbalance'), self.affinity.submit('shop2', 'getbalance'),
+                   self.affinity.submit('shop1', 'getbalance')]
+        self.assertEqual(self.affinity.depth(), {'shop1': 2, 'shop2': 1})
+        self.assertEqual(self.affinity.run_pending(), 2)
+        self.assertEqual(self.affinity.run_pending(), 1)
+        self.assertEqual(self.affinity.run_pending(), 0)
+        self.assertEqual([future.result() for future in futures], ['shop1', 'shop2', 'shop1'])
+        self.assertEqual(self.affinity.switches, 2)
+
+    def test_starved_wallet(self):
+        '''A wallet with one overdue call is served while a busier wallet keeps calls queued'''
+        self.affinity.submit('shop2', 'getbalance', deadline=-1)
+        for _ in range(5):
+            self.affinity.submit('shop1', 'getbalance')
+        self.affinity.run_pending()
+        self.assertEqual(self.wallet.calls, [('shop2', 'getbalance')])
+
+    def test_wallet_switching_methods(self):
+        '''Calls changing the open wallet are rejected, sent directly or through raw_request'''
+        for method, args, kwargs in (('open_wallet', ('shop2', 'password2'), {}),
+                                     ('raw_request', ('open_wallet', {'filename': 'shop2'}), {}),
+                                     ('raw_request', ('close_wallet',), {}),
+                                     ('raw_request', ('restore_deterministic_wallet',), {})):
+            with self.assertRaises(ValueError):
+                self.affinity.submit('shop1', method, *args, **kwargs)
+        self.assertEqual(self.affinity.depth(), {})
+
+    def test_unregistered(self):
+        '''Calls to unregistered wallet files are rejected'''
+        with self.assertRaises(KeyError):
+            self.affinity.submit('shop3', 'getbalance')
+
+
+if __name__ == '__main__':
+    unittest.main()
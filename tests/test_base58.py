@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the monerowallet.base58 module'''
+
+# standard library imports
+import unittest
+
+# our own library imports
+from monerowallet import base58
+
+ADDRESS = '44AFFq5kSiGBoZ4NMDwYtN18obc8AemS33DBLWs3H7otXft3XjrpDtQGv7SqSsaBYBb98uNbr2VBBEt7f2wfn3RVGQBEP3A'
+SUBADDRESS = 'BcUqEB1xnpBV2T3E9oYRwgGSzCGTEkDGD3zAEW1on9UMXBoRT7PBZfLTWjA6wgfHc824C6JxRT5N7GN74X3EehApQT4FbHR'
+INTEGRATED_ADDRESS = '4JwWT4sy2bjFfzSxvRBUxTLftcNM98DT5MvFp4JNJRih3icqrjVJiY8Jr9YF1atXN7UFBDx4vKq4s3ozUpkwrEAuMLBRqCy9Vhg9Y49vcq'
+
+
+class TestBase58(unittest.TestCase):
+    '''Tests of the Monero base58 encoding'''
+
+    def test_address_round_trip(self):
+        '''Standard addresses and subaddresses decode to 69 bytes and encode back'''
+        for address in (ADDRESS, SUBADDRESS):
+            raw = base58.decode(address)
+            self.assertEqual(len(raw), 69)
+            self.assertEqual(base58.encode(raw), address)
+
+    def test_integrated_address_round_trip(self):
+        '''Integrated addresses decode to 77 bytes and encode back'''
+        raw = base58.decode(INTEGRATED_ADDRESS)
+        self.assertEqual(len(raw), 77)
+        self.assertEqual(base58.encode(raw), INTEGRATED_ADDRESS)
+
+    def test_network_byte(self):
+        '''The first decoded byte is the network byte of the address'''
+        # mainnet address, testnet subaddress
+        self.assertEqual(base58.decode(ADDRESS)[0], 18)
+        self.assertEqual(base58.decode(SUBADDRESS)[0], 63)
+
+    def test_every_block_size(self):
+        '''Data of every length up to two full blocks round trips'''
+        data = bytes(range(256))
+        for length in range(17):
+            for chunk in (data[:length], b'\xff' * length, b'\x00' * length):
+                encoded = base58.encode(chunk)
+                self.assertEqual(base58.decode(encoded), chunk)
+
+    def test_block_length(self):
+        '''Full blocks encode to exactly 11 characters, leading zeros included'''
+        self.assertEqual(base58.encode(b'\x00' * 8), '1' * 11)
+        self.assertEqual(len(base58.encode(b'\xff' * 8)), 11)
+
+    def test_invalid_character(self):
+        '''Characters outside the alphabet are rejected'''
+        with self.assertRaises(ValueError):
+            base58.decode('0' * 11)
+
+    def test_invalid_block_length(self):
+        '''A trailing block of a length no data encodes to is rejected'''
+        with self.assertRaises(ValueError):
+            base58.decode('1' * 12)
+
+    def test_block_overflow(self):
+        '''A block whose value does not fit in 8 bytes is rejected'''
+        with self.assertRaises(ValueError):
+            base58.decode('z' * 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the monerowallet.confirmations module'''
+
+# standard library imports
+import time
+import unittest
+
+# our own library imports
+from monerowallet.confirmations import ConfirmationTracker, PendingTransaction
+from monerowallet.watcher import BLOCK_TIME
+
+
+class TestPendingTransaction(unittest.TestCase):
+    '''Tests of the maturity of a transaction'''
+
+    def test_mature_height(self):
+        '''A transaction matures after its confirmations, or at its height unlock time if later'''
+        self.assertEqual(PendingTransaction('a', 100, 10).mature_height, 110)
+        self.assertEqual(PendingTransaction('a', 100, 10, unlock_time=150).mature_height, 150)
+        self.assertEqual(PendingTransaction('a', 100, 10, unlock_time=105).mature_height, 110)
+
+    def test_timestamp_unlock(self):
+        '''A timestamp unlock time does not change the mature height, but locks the transaction until then'''
+        entry = PendingTransaction('a', 100, 10, unlock_time=1600000000)
+        self.assertEqual(entry.mature_height, 110)
+        self.assertFalse(entry.is_unlocked(now=1599999999))
+        self.assertTrue(entry.is_unlocked(now=1600000000))
+        self.assertTrue(PendingTransaction('a', 100, 10, unlock_time=150).is_unlocked(now=0))
+
+
+class TestConfirmationTracker(unittest.TestCase):
+    '''Tests of the confirmation tracker'''
+
+    def setUp(self):
+        self.confirmed = []
+        self.reorged = []
+        self.tracker = ConfirmationTracker(on_confirmed=lambda entry: self.confirmed.append(entry.tx_hash),
+                                           on_reorg=lambda entry: self.reorged.append(entry.tx_hash),
+                                           reorg_depth=10)
+
+    def test_maturity_order(self):
+        '''Transactions mature once each, when the height reaches their mature height, in that order'''
+        self.tracker.add('c', 100, 20)
+        self.tracker.add('a', 100, 5)
+        self.tracker.add('b', 102, 5)
+        self.assertEqual(self.tracker.update(104), [])
+        self.assertEqual([entry.tx_hash for entry in self.tracker.update(107)], ['a', 'b'])
+        self.assertEqual(self.tracker.update(108), [])
+        self.tracker.update(200)
+        self.assertEqual(self.confirmed, ['a', 'b', 'c'])
+        self.assertEqual(len(self.tracker), 0)
+
+    def test_replace_and_discard(self):
+        '''A transaction added again matures from its last block, a discarded one never matures'''
+        self.tracker.add('a', 100, 5)
+        self.tracker.add('a', 103, 5)
+        self.tracker.add('b', 100, 5)
+        self.tracker.discard('b')
+        self.assertEqual(len(self.tracker), 1)
+        self.tracker.update(105)
+        self.assertEqual(self.confirmed, [])
+        self.tracker.update(108)
+        self.assertEqual(self.confirmed, ['a'])
+
+    def test_postponed_timestamp_unlock(self):
+        '''A transaction locked until a timestamp is looked at again around that time'''
+        self.tracker.add('a', 100, 5, unlock_time=int(time.time() + 2.5 * BLOCK_TIME))
+        self.tracker.update(105)
+        self.assertEqual(self.confirmed, [])
+        self.assertIn('a', self.tracker)
+        # looked at again 3 blocks later
+        self.assertEqual(self.tracker._heap[0][0], 108)
+        self.tracker.update(107)
+        self.assertEqual(self.confirmed, [])
+        self.tracker.add('b', 100, 5, unlock_time=int(time.time() - 1))
+        self.tracker.update(107)
+        self.assertEqual(self.confirmed, ['b'])
+
+    def test_height_goes_back(self):
+        '''Confirmed transactions are tracked again when the height goes back below their mature height'''
+        self.tracker.add('a', 100, 5)
+        self.tracker.add('b', 101, 5)
+        self.tracker.update(106)
+        self.tracker.update(105)
+        self.assertEqual(self.reorged, ['b'])
+        self.assertIn('b', self.tracker)
+        self.tracker.update(106)
+        self.assertEqual(self.confirmed, ['a', 'b', 'b'])
+
+    def test_forget_after_reorg_depth(self):
+        '''Confirmed transactions out of the reorganization window are not tracked again'''
+        self.tracker.add('a', 100, 5)
+        self.tracker.update(105)
+        self.tracker.update(120)
+        self.tracker.update(100)
+        self.assertEqual(self.reorged, [])
+        self.assertNotIn('a', self.tracker)
+
+    def test_recheck_moved(self):
+        '''A transaction found in another block matures from that block, confirmed or not'''
+        self.tracker.add('a', 100, 5)
+        self.tracker.add('b', 100, 10)
+        self.tracker.update(106)
+        payments = [{'tx_hash': 'a', 'block_height': 104}, {'tx_hash': 'b', 'block_height': 102},
+                    {'tx_hash': 'unknown', 'block_height': 103}]
+        moved = self.tracker.recheck(payments, min_block_height=96)
+        self.assertEqual(sorted(entry.tx_hash for entry in moved), ['a', 'b'])
+        self.assertEqual(self.reorged, ['a'])
+        self.assertEqual(self.confirmed, ['a'])
+        self.tracker.update(109)
+        self.assertEqual(self.confirmed, ['a', 'a'])
+        self.tracker.update(112)
+        self.assertEqual(self.confirmed, ['a', 'a', 'b'])
+
+    def test_recheck_missing(self):
+        '''Transactions of the rechecked blocks missing from the payments are dropped, older ones are kept'''
+        self.tracker.add('confirmed', 100, 2)
+        self.tracker.add('pending', 101, 10)
+        self.tracker.add('old', 90, 30)
+        self.tracker.add('kept', 101, 10)
+        self.tracker.update(103)
+        self.tracker.recheck([{'tx_hash': 'kept', 'block_height': 101}])
+        self.assertEqual(sorted(self.reorged), ['confirmed', 'pending'])
+        self.assertNotIn('pending', self.tracker)
+        self.assertIn('old', self.tracker)
+        # a dropped transaction is not tracked again when the height goes back
+        self.tracker.update(101)
+        self.assertEqual(sorted(self.reorged), ['confirmed', 'pending'])
+        self.tracker.update(130)
+        self.assertEqual(self.confirmed, ['confirmed', 'kept', 'old'])
+
+    def test_recheck_window(self):
+        '''Only the transactions above min_block_height are expected in the payments'''
+        self.tracker.add('a', 100, 5)
+        self.tracker.add('b', 104, 5)
+        self.tracker.recheck([], min_block_height=100)
+        self.assertEqual(self.reorged, ['b'])
+        self.assertIn('a', self.tracker)
+        # without a height nor min_block_height, missing transactions are kept
+        tracker = ConfirmationTracker()
+        tracker.add('a', 100, 5)
+        tracker.recheck([])
+        self.assertIn('a', tracker)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the monerowallet.pool module'''
+
+# standard library imports
+import unittest
+
+# 3rd party library imports
+import requests
+
+# our own library imports
+from monerowallet.pool import WalletPool
+
+
+class TestWalletPool(unittest.TestCase):
+    '''Tests of the connection pool of a wallet pool, no request being sent'''
+
+    def setUp(self):
+        self.pool = WalletPool(pool_maxsize=2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_shared_session(self):
+        '''The wallets of the pool share its session'''
+        wallet = self.pool.add('shop1', port=18082)
+        self.assertIs(wallet.session, self.pool.session)
+        self.assertIs(self.pool['shop1'], wallet)
+
+    def test_grow(self):
+        '''The connection pool grows with the number of servers, and the replaced adapter is closed'''
+        first = self.pool.session.get_adapter('http://127.0.0.1:18082/')
+        for port in range(18082, 18082 + requests.adapters.DEFAULT_POOLSIZE):
+            self.pool.add(port, port=port)
+        self.assertIs(self.pool.session.get_adapter('http://127.0.0.1:18082/'), first)
+        self.pool.add('last', port=18000)
+        adapter = self.pool.session.get_adapter('http://127.0.0.1:18082/')
+        self.assertIsNot(adapter, first)
+        self.assertIs(self.pool.session.get_adapter('https://127.0.0.1:18082/'), adapter)
+        self.assertEqual(self.pool._pool_connections, 2 * requests.adapters.DEFAULT_POOLSIZE)
+        self.assertEqual(adapter.poolmanager.connection_pool_kw['maxsize'], 2)
+        self.assertEqual(len(first.poolmanager.pools), 0)
+
+    def test_remove(self):
+        '''A server is forgotten once no wallet of the pool uses it anymore'''
+        self.pool.add('shop1', port=18082)
+        self.pool.add('shop2', port=18082)
+        self.pool.add('shop3', port=18083)
+        self.pool.remove('shop1')
+        self.assertEqual(len(self.pool._servers), 2)
+        self.pool.remove('shop2')
+        self.assertEqual(len(self.pool._servers), 1)
+        self.assertNotIn('shop2', self.pool)
+        self.assertEqual(len(self.pool), 1)
+
+    def test_given_session(self):
+        '''The adapters of a given session are left as is'''
+        session = requests.Session()
+        adapter = session.get_adapter('http://127.0.0.1:18082/')
+        pool = WalletPool(session=session)
+        for port in range(18082, 18082 + 2 * requests.adapters.DEFAULT_POOLSIZE):
+            pool.add(port, port=port)
+        self.assertIs(session.get_adapter('http://127.0.0.1:18082/'), adapter)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
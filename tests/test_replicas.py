@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the monerowallet.replicas module'''
+
+# standard library imports
+import threading
+import unittest
+
+# our own library imports
+from monerowallet.replicas import ReplicaSet
+
+
+class TestReplicaSet(unittest.TestCase):
+    '''Tests of the replica checks and picks, the heights being given by a callable'''
+
+    def setUp(self):
+        self.heights = {None: 100, 18092: 100, 18093: 99, 18094: 90}
+        self.replicas = ReplicaSet([{'host': '127.0.0.1', 'port': port} for port in (18092, 18093, 18094)], max_lag=2)
+
+    def getheight(self, server=None):
+        height = self.heights[None if server is None else server['port']]
+        if isinstance(height, Exception):
+            raise height
+        return height
+
+    def check(self, **kwargs):
+        thread = self.replicas.check(self.getheight, **kwargs)
+        if thread is not None:
+            thread.join(5)
+        return thread
+
+    def ports(self, **kwargs):
+        '''Ports of the replicas picked, each pick being released at once'''
+        ports = set()
+        for _ in range(6):
+            replica = self.replicas.acquire(**kwargs)
+            if replica is not None:
+                ports.add(replica.server['port'])
+                self.replicas.release(replica)
+        return ports
+
+    def test_unchecked(self):
+        '''No replica is used until checked'''
+        self.assertIsNone(self.replicas.acquire())
+
+    def test_lag(self):
+        '''Replicas lagging more than max_lag are not used'''
+        self.check()
+        self.assertEqual(self.ports(), {18092, 18093})
+        self.assertEqual(self.replicas.primary_height, 100)
+
+    def test_cursor(self):
+        '''Only replicas at the requested height are used'''
+        self.check()
+        self.assertEqual(self.ports(min_height=100), {18092})
+        self.replicas.observe(101)
+        self.assertEqual(self.ports(min_height=self.replicas.primary_height), set())
+
+    def test_background(self):
+        '''The check runs in another thread, and is not started again until due'''
+        checked = threading.Event()
+        release = threading.Event()
+
+        def getheight(server=None):
+            checked.set()
+            release.wait(5)
+            return 100
+
+        thread = self.replicas.check(getheight)
+        self.assertTrue(checked.wait(5))
+        self.assertIsNot(thread, threading.current_thread())
+        # a check is running: none is started, and requests go on with the current state
+        self.assertIsNone(self.replicas.check(getheight))
+        self.assertIsNone(self.replicas.acquire())
+        release.set()
+        thread.join(5)
+        self.assertEqual(self.ports(), {18092, 18093, 18094})
+        self.assertIsNone(self.replicas.check(getheight))
+
+    def test_new_height(self):
+        '''A new primary height observed makes the next check run before the check interval'''
+        self.check()
+        self.assertIsNone(self.check())
+        self.heights.update({None: 104, 18092: 104})
+        self.replicas.observe(104)
+        self.assertIsNotNone(self.check())
+        self.assertEqual(self.ports(), {18092})
+
+    def test_failures(self):
+        '''A failed replica is not used until the next check, a primary down does not stop reads'''
+        self.check()
+        replica = self.replicas.acquire(min_height=100)
+        self.replicas.release(replica, failed=True)
+        self.assertEqual(self.ports(), {18093})
+        self.heights[None] = OSError('down')
+        self.check(force=True)
+        self.assertEqual(self.ports(), {18092, 18093, 18094})
+
+
+if __name__ == '__main__':
+    unittest.main()
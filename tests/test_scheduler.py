@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the monerowallet.scheduler module'''
+
+# standard library imports
+import threading
+import time
+import unittest
+
+# our own library imports
+from monerowallet.scheduler import BULK, INTERACTIVE, NORMAL, PRIORITY_NAMES, RequestScheduler
+
+
+class TestRequestScheduler(unittest.TestCase):
+    '''Tests of the order requests are served in, one slot being held while others queue'''
+
+    def setUp(self):
+        self.scheduler = RequestScheduler(concurrency=1, max_wait=5.0, bulk_chunk_size=2)
+        self.served = []
+        self.threads = []
+
+    def tearDown(self):
+        for thread in self.threads:
+            thread.join(5)
+
+    def queue(self, name, priority):
+        '''Queue a request in another thread, and wait until its ticket is queued'''
+        depth = self.scheduler.stats()[PRIORITY_NAMES[priority]]['depth']
+
+        def request():
+            with self.scheduler.slot(priority):
+                self.served.append(name)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        self.threads.append(thread)
+        deadline = time.monotonic() + 5
+        while self.scheduler.stats()[PRIORITY_NAMES[priority]]['depth'] == depth:
+            self.assertLess(time.monotonic(), deadline, 'request not queued')
+            time.sleep(0.001)
+
+    def release(self, slot):
+        '''Release a held slot, and wait until every queued request is served'''
+        slot.__exit__(None, None, None)
+        for thread in self.threads:
+            thread.join(5)
+
+    def hold(self):
+        slot = self.scheduler.slot(NORMAL)
+        slot.__enter__()
+        return slot
+
+    def test_free_slot(self):
+        '''A request is served at once when a slot is free'''
+        with self.scheduler.slot(BULK):
+            pass
+        stats = self.scheduler.stats()
+        self.assertEqual(stats['bulk']['served'], 1)
+        self.assertEqual(stats['bulk']['depth'], 0)
+
+    def test_priority_order(self):
+        '''Queued requests are served by priority, then in the order they were queued'''
+        slot = self.hold()
+        self.queue('bulk 1', BULK)
+        self.queue('normal', NORMAL)
+        self.queue('bulk 2', BULK)
+        self.queue('interactive', INTERACTIVE)
+        self.assertEqual(self.scheduler.stats()['bulk']['depth'], 2)
+        self.release(slot)
+        self.assertEqual(self.served, ['interactive', 'normal', 'bulk 1', 'bulk 2'])
+
+    def test_max_wait(self):
+        '''A request queued for longer than max_wait is served before higher priorities'''
+        slot = self.hold()
+        self.queue('bulk', BULK)
+        self.queue('interactive', INTERACTIVE)
+        self.scheduler._queues[BULK][0].enqueued_at -= 10
+        self.release(slot)
+        self.assertEqual(self.served, ['bulk', 'interactive'])
+        self.assertGreaterEqual(self.scheduler.stats()['bulk']['wait_max'], 10)
+
+    def test_strict_priorities(self):
+        '''Without max_wait, priorities are strict however long a request waited'''
+        self.scheduler.max_wait = None
+        slot = self.hold()
+        self.queue('bulk', BULK)
+        self.queue('interactive', INTERACTIVE)
+        self.scheduler._queues[BULK][0].enqueued_at -= 10
+        self.release(slot)
+        self.assertEqual(self.served, ['interactive', 'bulk'])
+
+    def test_priority_context(self):
+        '''The priority set for a thread overrides the default priority of the methods'''
+        self.assertEqual(self.scheduler.priority_for('getaddress'), INTERACTIVE)
+        self.assertEqual(self.scheduler.priority_for('incoming_transfers'), BULK)
+        self.assertEqual(self.scheduler.priority_for('transfer'), NORMAL)
+        with self.scheduler.priority(BULK):
+            self.assertEqual(self.scheduler.priority_for('getaddress'), BULK)
+        self.assertEqual(self.scheduler.priority_for('getaddress'), INTERACTIVE)
+        with self.assertRaises(ValueError):
+            with self.scheduler.priority(3):
+                pass
+
+    def test_chunks(self):
+        '''Items are split in chunks of bulk_chunk_size'''
+        self.assertEqual(list(self.scheduler.chunks([1, 2, 3, 4, 5])), [[1, 2], [3, 4], [5]])
+        self.assertEqual(list(self.scheduler.chunks([])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the monerowallet.snapshot module'''
+
+# standard library imports
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+# our own library imports
+from monerowallet import exceptions
+from monerowallet.snapshot import Snapshot, _HEADER
+
+ADDRESS = '44AFFq5kSiGBoZ4NMDwYtN18obc8AemS33DBLWs3H7otXft3XjrpDtQGv7SqSsaBYBb98uNbr2VBBEt7f2wfn3RVGQBEP3A'
+SUBADDRESS = 'BcUqEB1xnpBV2T3E9oYRwgGSzCGTEkDGD3zAEW1on9UMXBoRT7PBZfLTWjA6wgfHc824C6JxRT5N7GN74X3EehApQT4FbHR'
+OTHER_ADDRESS = '888tNkZrPN6JsEgekjMnABU4TBzc2Dt29EPAvkRxbANsAnjyPbb3iQ1YBRk1UXcdRsiKc9dhwMVgN5S9cQUiyoogDavup3H'
+
+
+class TestSnapshot(unittest.TestCase):
+    '''Tests of the snapshot files'''
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'wallet.snapshot')
+        self.snapshot = Snapshot(ADDRESS, 1146043)
+        self.snapshot.subaddresses.add(0, 0, ADDRESS, 'Primary account')
+        self.snapshot.subaddresses.add(1, 2, SUBADDRESS, 'Étiquette')
+        self.snapshot.accounts = {'subaddress_accounts': [{'account_index': 0, 'balance': 5}], 'total_balance': 5}
+        self.snapshot.payments = [{'payment_id': '4279257e0a20608e', 'block_height': 1146043, 'amount': 5}]
+        self.snapshot.transfers = {'in': [{'height': 1146043, 'amount': 5}], 'out': []}
+        self.snapshot.save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def rewrite(self, transform):
+        '''Replace the snapshot file with a transformed copy'''
+        with open(self.path, 'rb') as snapshotfile:
+            data = snapshotfile.read()
+        with open(self.path, 'wb') as snapshotfile:
+            snapshotfile.write(transform(data))
+
+    def body_offset(self):
+        '''Offset of the compressed body in the snapshot file'''
+        with open(self.path, 'rb') as snapshotfile:
+            return _HEADER.size + _HEADER.unpack(snapshotfile.read(_HEADER.size))[3]
+
+    def test_round_trip(self):
+        '''A loaded snapshot holds what was saved, and the temporary file is gone'''
+        snapshot = Snapshot.load(self.path, address=ADDRESS, max_height=1146043)
+        self.assertEqual(snapshot.address, ADDRESS)
+        self.assertEqual(snapshot.height, 1146043)
+        self.assertEqual(list(snapshot.subaddresses.entries()), list(self.snapshot.subaddresses.entries()))
+        self.assertEqual(snapshot.subaddresses.lookup(SUBADDRESS), (1, 2, 'Étiquette'))
+        self.assertEqual(snapshot.accounts, self.snapshot.accounts)
+        self.assertEqual(snapshot.payments, self.snapshot.payments)
+        self.assertEqual(snapshot.transfers, self.snapshot.transfers)
+        self.assertEqual(os.listdir(self.directory), ['wallet.snapshot'])
+
+    def test_wrong_address(self):
+        '''The snapshot of another wallet is not loaded'''
+        self.assertIsNone(Snapshot.load(self.path, address=OTHER_ADDRESS))
+
+    def test_max_height(self):
+        '''A snapshot more recent than the wallet is not loaded'''
+        self.assertIsNone(Snapshot.load(self.path, address=ADDRESS, max_height=1146042))
+
+    def test_rejected_before_body(self):
+        '''A rejected snapshot is rejected from its header, even with a corrupted body'''
+        offset = self.body_offset()
+        self.rewrite(lambda data: data[:offset] + b'garbage')
+        self.assertIsNone(Snapshot.load(self.path, address=OTHER_ADDRESS))
+        self.assertIsNone(Snapshot.load(self.path, max_height=0))
+
+    def test_truncated_header(self):
+        '''A file shorter than the header is not a snapshot'''
+        self.rewrite(lambda data: data[:_HEADER.size - 1])
+        with self.assertRaises(exceptions.SnapshotError):
+            Snapshot.load(self.path)
+
+    def test_bad_magic(self):
+        '''A file of another format or version is not a snapshot'''
+        self.rewrite(lambda data: b'XXXX' + data[4:])
+        with self.assertRaises(exceptions.SnapshotError):
+            Snapshot.load(self.path)
+        self.rewrite(lambda data: b'PMWS\x01' + data[5:])
+        with self.assertRaises(exceptions.SnapshotError):
+            Snapshot.load(self.path)
+
+    def test_truncated_body(self):
+        '''A truncated body is reported as corrupted'''
+        self.rewrite(lambda data: data[:-10])
+        with self.assertRaises(exceptions.SnapshotError):
+            Snapshot.load(self.path, address=ADDRESS)
+
+    def test_corrupted_body(self):
+        '''A body which is not compressed, or does not decode, is reported as corrupted'''
+        offset = self.body_offset()
+        for body in (b'garbage', zlib.compress(b'\xff\xff\xff\xff'), zlib.compress(b'\x00\x00\x00\x00{}'),
+                     zlib.compress(b'\x00\x00\x00\x00not json')):
+            self.rewrite(lambda data: data[:offset] + body)
+            with self.assertRaises(exceptions.SnapshotError):
+                Snapshot.load(self.path, address=ADDRESS)
+
+    def test_empty(self):
+        '''A snapshot without state is loaded empty'''
+        Snapshot(ADDRESS, 0).save(self.path)
+        snapshot = Snapshot.load(self.path)
+        self.assertEqual(len(snapshot.subaddresses), 0)
+        self.assertEqual(snapshot.transfers, {'in': [], 'out': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
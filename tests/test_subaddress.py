@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the monerowallet.subaddress module'''
+
+# standard library imports
+import unittest
+
+# our own library imports
+from monerowallet import base58
+from monerowallet.subaddress import SubaddressIndex
+
+ADDRESS = '44AFFq5kSiGBoZ4NMDwYtN18obc8AemS33DBLWs3H7otXft3XjrpDtQGv7SqSsaBYBb98uNbr2VBBEt7f2wfn3RVGQBEP3A'
+SUBADDRESS = 'BcUqEB1xnpBV2T3E9oYRwgGSzCGTEkDGD3zAEW1on9UMXBoRT7PBZfLTWjA6wgfHc824C6JxRT5N7GN74X3EehApQT4FbHR'
+
+
+class TestSubaddressIndex(unittest.TestCase):
+    '''Tests of the two-way subaddress index'''
+
+    def setUp(self):
+        self.index = SubaddressIndex()
+        self.index.add(0, 0, ADDRESS, 'Primary account')
+        self.index.add(0, 2, SUBADDRESS)
+
+    def test_round_trip(self):
+        '''An address is found from its indexes and back'''
+        self.assertEqual(self.index.address(0, 2), SUBADDRESS)
+        self.assertEqual(self.index.lookup(SUBADDRESS), (0, 2, ''))
+        self.assertEqual(self.index.lookup(ADDRESS), (0, 0, 'Primary account'))
+        self.assertEqual(len(self.index), 2)
+        self.assertIn(SUBADDRESS, self.index)
+
+    def test_large_indexes(self):
+        '''Indexes use the whole 32 bits of the major and minor parts, an address moved to them leaves its old indexes'''
+        self.index.add(0xffffffff, 0xffffffff, SUBADDRESS)
+        self.assertEqual(self.index.lookup(SUBADDRESS), (0xffffffff, 0xffffffff, ''))
+        self.assertEqual(self.index.address(0xffffffff, 0xffffffff), SUBADDRESS)
+        self.assertIsNone(self.index.address(0, 2))
+
+    def test_unknown(self):
+        '''Unknown or invalid addresses and indexes are not found'''
+        self.assertIsNone(self.index.address(1, 0))
+        self.assertIsNone(self.index.lookup(base58.encode(b'\x2a' * 69)))
+        self.assertIsNone(self.index.lookup('not an address'))
+        self.assertNotIn('not an address', self.index)
+
+    def test_replace(self):
+        '''Adding an address at the indexes of another replaces it, and leaves its own previous indexes'''
+        self.index.add(0, 2, ADDRESS, 'moved')
+        self.assertIsNone(self.index.lookup(SUBADDRESS))
+        self.assertEqual(self.index.lookup(ADDRESS), (0, 2, 'moved'))
+        self.assertIsNone(self.index.address(0, 0))
+        self.assertEqual(len(self.index), 1)
+
+    def test_labels(self):
+        '''Labels are set, cleared and ignored for unknown subaddresses'''
+        self.index.set_label(0, 2, 'shop')
+        self.assertEqual(self.index.lookup(SUBADDRESS), (0, 2, 'shop'))
+        self.index.set_label(0, 2, '')
+        self.assertEqual(self.index.lookup(SUBADDRESS), (0, 2, ''))
+        self.index.set_label(5, 5, 'unknown')
+        self.assertIsNone(self.index.address(5, 5))
+
+    def test_entries_round_trip(self):
+        '''The binary entries of an index rebuild the same index'''
+        copy = SubaddressIndex()
+        for major, minor, raw, label in self.index.entries():
+            copy.add_raw(major, minor, raw, label)
+        self.assertEqual(sorted(copy.entries()), sorted(self.index.entries()))
+        self.assertEqual(copy.lookup(ADDRESS), (0, 0, 'Primary account'))
+
+    def test_max_minor(self):
+        '''The highest subaddress index of an account follows additions and removals'''
+        self.assertEqual(self.index.max_minor(0), 2)
+        self.assertIsNone(self.index.max_minor(1))
+        self.index.add(0, 7, base58.encode(b'\x2a' * 69))
+        self.assertEqual(self.index.max_minor(0), 7)
+        self.index.add(0, 3, base58.encode(b'\x2a' * 69))
+        self.assertEqual(self.index.max_minor(0), 3)
+
+    def test_many_entries(self):
+        '''Entries stay reachable both ways while the hash tables grow and slots are reused'''
+        addresses = [base58.encode(bytes([42]) + index.to_bytes(68, 'big')) for index in range(1000)]
+        for minor, address in enumerate(addresses):
+            self.index.add(1, minor, address)
+        for minor, address in enumerate(addresses[:500]):
+            self.index.add(2, minor, address)
+        self.assertEqual(len(self.index), 1002)
+        for minor, address in enumerate(addresses):
+            major = 2 if minor < 500 else 1
+            self.assertEqual(self.index.lookup(address), (major, minor, ''))
+            self.assertEqual(self.index.address(major, minor), address)
+        self.assertIsNone(self.index.address(1, 0))
+        self.assertEqual(self.index.max_minor(1), 999)
+
+    def test_address_size(self):
+        '''Only addresses of the size of a subaddress are indexed'''
+        with self.assertRaises(ValueError):
+            self.index.add_raw(0, 5, b'\x2a' * 77)
+
+    def test_clear(self):
+        '''Clearing empties both directions of the index'''
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertIsNone(self.index.lookup(SUBADDRESS))
+        self.assertIsNone(self.index.address(0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()